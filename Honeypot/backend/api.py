@@ -1,15 +1,30 @@
 # backend/api.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from database import SessionLocal, Attack
-from sqlalchemy import inspect
+from database import AsyncSessionLocal, Attack, Campaign, DataVersion, SketchBucket, async_engine, init_db
+from utils.cache import cache_from_env
+from utils.formats import MEDIA_TYPES, dumps_json, encode_rows, encode_table, negotiate, stream_rows
+from utils.sketches import ALL_TIME, TOPK_CAPACITY, TOPK_FIELDS, load_bucket, merge_buckets, window_days
+from sqlalchemy import case, func, select
 from datetime import datetime
-from collections import Counter
-import csv
-from fastapi.responses import StreamingResponse
-import io
+from collections import defaultdict
+import asyncio
+import hashlib
+import os
+from fastapi.responses import Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # The read-only engine can't create the file, so make sure the schema exists first
+    await run_in_threadpool(init_db)
+    yield
+    # aiosqlite connections each own a worker thread — close them on shutdown
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,32 +34,113 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def object_as_dict(obj):
-    return {c.key: getattr(obj, c.key) for c in inspect(obj).mapper.column_attrs}
+# Pre-rendered plots and tile pyramids from machinelearning_part/density_plots.py
+# (tiles/{z}/{x}/{y}.png + tiles.json), served as plain files when configured
+PLOTS_DIR = os.environ.get("HONEYPOT_PLOTS_DIR")
+if PLOTS_DIR:
+    app.mount("/plots", StaticFiles(directory=PLOTS_DIR, check_dir=False), name="plots")
+
+# Plain Core rows instead of ORM objects — no identity map / instance setup per row
+attacks_table = Attack.__table__
+
+EXPORT_BATCH_ROWS = 50_000
+ROW_FORMATS = ("json", "msgpack", "arrow", "parquet")
+
+# === Response cache ===
+# Keyed by path + query string + format, tagged with the data_version counter that the
+# honeypot bumps on every insert. While nothing is written every viewer gets a
+# 304 (or the cached body); the first request after a write rebuilds it once.
+response_cache = cache_from_env()
+_build_locks = {}
+
+async def current_data_version():
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(select(DataVersion.counter).where(DataVersion.id == 1))).scalar() or 0
+
+def make_etag(key, version):
+    return '"%s-%s"' % (version, hashlib.sha1(key.encode()).hexdigest()[:16])
+
+def not_modified(request, etag):
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (t.strip() for t in if_none_match.split(","))
+
+async def cached_response(request, build, fmt="json", extra_key=""):
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}#{fmt}#{extra_key}"
+    version = await current_data_version()
+    etag = make_etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key, version)
+    if body is None:
+        # Single-flight: concurrent misses on the same key wait for one build.
+        # The entry counts its holder + waiters and goes away with the last of them
+        # (lock.locked() is briefly False while a waiter is being handed the lock).
+        entry = _build_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                body = response_cache.get(key, version)
+                if body is None:
+                    body = await build()
+                    response_cache.set(key, version, body)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _build_locks[key]
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+def not_acceptable(allowed):
+    return Response(
+        dumps_json({"detail": f"Supported formats: {', '.join(allowed)}"}),
+        status_code=406,
+        media_type="application/json",
+    )
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Honeypot API Running!"}
 
 @app.get("/api/attacks")
-def get_attacks():
-    session = SessionLocal()
-    try:
-        attacks = session.query(Attack).order_by(Attack.timestamp.desc()).limit(500).all()
-        result = [object_as_dict(a) for a in attacks]
-    finally:
-        session.close()
-    return result
+async def get_attacks(request: Request, limit: int = Query(500, ge=1, le=100_000)):
+    fmt = negotiate(request, ROW_FORMATS, "json")
+    if fmt is None:
+        return not_acceptable(ROW_FORMATS)
+
+    async def build():
+        return encode_rows(fmt, attacks_table.columns, await load_recent_attacks(limit))
+
+    return await cached_response(request, build, fmt)
+
+async def load_recent_attacks(limit=500):
+    async with AsyncSessionLocal() as session:
+        rows = await session.execute(select(attacks_table).order_by(attacks_table.c.timestamp.desc()).limit(limit))
+        return rows.all()
 
 @app.get("/api/stats")
-def get_stats():
-    session = SessionLocal()
-    try:
-        attacks = session.query(Attack).all()
-    finally:
-        session.close()
+async def get_stats(request: Request):
+    # today_attacks depends on the date, so a new day is a new cache entry
+    async def build():
+        return dumps_json(await compute_stats())
+
+    return await cached_response(request, build, extra_key=str(datetime.utcnow().date()))
+
+async def compute_stats():
+    c = attacks_table.c
+    today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    async with AsyncSessionLocal() as session:
+        total, today_attacks, avg_duration, max_rate, avg_pkt = (await session.execute(select(
+            func.count(),
+            func.sum(case((c.timestamp >= today_start, 1), else_=0)),
+            func.avg(func.coalesce(c.flow_duration, 0)),
+            func.max(func.coalesce(c.flow_bytes_s, 0)),
+            func.avg(func.coalesce(c.average_packet_size, 0)),
+        ))).one()
 
-    if not attacks:
+    if not total:
         return {
             "total_attacks": 0,
             "today_attacks": 0,
@@ -56,23 +152,19 @@ def get_stats():
             "most_common_username": "N/A"
         }
 
-    today = datetime.utcnow().date()
-    today_attacks = sum(1 for a in attacks if a.timestamp.date() == today)
-    unique_ips = len({a.src_ip for a in attacks})
-
-    country_counter = Counter(a.country for a in attacks if a.country)
-    top_countries = [{"name": c or "Unknown", "count": n} for c, n in country_counter.most_common(5)]
-
-    avg_duration = sum(a.flow_duration or 0 for a in attacks) / len(attacks)
-    max_rate = max((a.flow_bytes_s or 0 for a in attacks), default=0)
-    avg_pkt = sum(a.average_packet_size or 0 for a in attacks) / len(attacks)
-
-    user_counter = Counter(a.username for a in attacks)
-    top_user = user_counter.most_common(1)[0][0] if user_counter else "N/A"
+    sketches = await load_sketches(0)
+    if sketches is not None:
+        unique_ips = sketches["src_ip_hll"].estimate()
+        top_countries = [{"name": t["value"], "count": t["count"]} for t in sketches["country"].top(5)]
+        top_users = sketches["username"].top(1)
+        top_user = top_users[0]["value"] if top_users else "N/A"
+    else:
+        # Sketches not built yet (honeypot hasn't run since upgrading) — count exactly
+        unique_ips, top_countries, top_user = await exact_stats()
 
     return {
-        "total_attacks": len(attacks),
-        "today_attacks": today_attacks,
+        "total_attacks": total,
+        "today_attacks": today_attacks or 0,
         "unique_ips": unique_ips,
         "top_countries": top_countries,
         "avg_flow_duration": avg_duration,
@@ -81,26 +173,181 @@ def get_stats():
         "most_common_username": top_user
     }
 
-@app.get("/api/export-csv")
-def export_csv():
-    session = SessionLocal()
+async def exact_stats():
+    c = attacks_table.c
+    async with AsyncSessionLocal() as session:
+        unique_ips = (await session.execute(select(func.count(func.distinct(c.src_ip))))).scalar()
+        countries = (await session.execute(
+            select(c.country, func.count()).where(c.country != "").group_by(c.country).order_by(func.count().desc()).limit(5)
+        )).all()
+        user = (await session.execute(
+            select(c.username).group_by(c.username).order_by(func.count().desc()).limit(1)
+        )).scalar()
+    return unique_ips, [{"name": n or "Unknown", "count": k} for n, k in countries], user or "N/A"
+
+# === Sketch queries ===
+# Answered from per-day HyperLogLog / Space-Saving buckets maintained by the
+# honeypot (see utils/sketches.py for the error bounds). days=0 = all time.
+
+async def load_sketches(days, kinds=None):
+    keys = [ALL_TIME] if days == 0 else window_days(days)
+    query = select(SketchBucket.day, SketchBucket.kind, SketchBucket.data).where(SketchBucket.day.in_(keys))
+    if kinds:
+        query = query.where(SketchBucket.kind.in_(kinds))
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(query)).all()
+    if not rows:
+        return None
+    per_day = defaultdict(dict)
+    for day, kind, data in rows:
+        per_day[day][kind] = data
+    return merge_buckets(load_bucket(blobs) for blobs in per_day.values())
+
+@app.get("/api/sketches/unique-ips")
+async def sketch_unique_ips(request: Request, days: int = Query(7, ge=0, le=3660)):
+    async def build():
+        sketches = await load_sketches(days, ["src_ip_hll"])
+        hll = sketches["src_ip_hll"] if sketches else None
+        return dumps_json({
+            "days": days,
+            "unique_ips": hll.estimate() if hll else 0,
+            "relative_error": hll.relative_error if hll else 0,
+        })
+
+    return await cached_response(request, build, extra_key=str(datetime.utcnow().date()))
+
+@app.get("/api/sketches/top")
+async def sketch_top(
+    request: Request,
+    field: str = Query("src_ip", pattern="^(" + "|".join(TOPK_FIELDS) + ")$"),
+    k: int = Query(20, ge=1, le=TOPK_CAPACITY),
+    days: int = Query(7, ge=0, le=3660),
+):
+    async def build():
+        sketches = await load_sketches(days, [field])
+        summary = sketches[field] if sketches else None
+        return dumps_json({
+            "field": field,
+            "days": days,
+            "total": summary.total if summary else 0,
+            "items": summary.top(k) if summary else [],
+        })
+
+    return await cached_response(request, build, extra_key=str(datetime.utcnow().date()))
+
+# === Campaigns ===
+# Per-attacker aggregates maintained incrementally by utils/campaigns.py
+
+campaign_columns = [c for c in Campaign.__table__.columns if c.name != "state"]
+
+@app.get("/api/campaigns")
+async def get_campaigns(
+    request: Request,
+    limit: int = Query(100, ge=1, le=100_000),
+    src_ip: str | None = None,
+    active: bool | None = None,
+    min_attempts: int = Query(1, ge=1),
+):
+    fmt = negotiate(request, ROW_FORMATS, "json")
+    if fmt is None:
+        return not_acceptable(ROW_FORMATS)
+
+    async def build():
+        t = Campaign.__table__
+        query = select(*campaign_columns).where(t.c.attempts >= min_attempts)
+        if src_ip:
+            query = query.where(t.c.src_ip == src_ip)
+        if active is not None:
+            query = query.where(t.c.state.isnot(None) if active else t.c.state.is_(None))
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(query.order_by(t.c.end_ts.desc()).limit(limit))).all()
+        return encode_rows(fmt, campaign_columns, rows)
+
+    return await cached_response(request, build, fmt)
+
+# === Analytics ===
+# Named group-bys over live + archived attacks, run in-process by DuckDB
+# (utils/analytics.py). Parameters come from the query string, e.g.
+#   /api/analytics/top_countries?since=2025-01-01&limit=10
+# Free-form SQL is off unless HONEYPOT_ANALYTICS_SQL=1.
+# The other endpoints read SQLite only: rows archived with
+# `utils.analytics archive --delete` are visible here (and in the sketches), not there.
+
+ANALYTICS_FORMATS = ("json", "msgpack", "arrow", "parquet", "csv")
+ANALYTICS_SQL_ENABLED = os.environ.get("HONEYPOT_ANALYTICS_SQL") == "1"
+
+async def run_analytics(fn):
+    # The engine is created on first use so the API starts without touching DuckDB
+    from utils.analytics import QueryError, get_engine
+
     try:
-        attacks = session.query(Attack).order_by(Attack.timestamp.desc()).all()
-    finally:
-        session.close()
+        return await run_in_threadpool(lambda: fn(get_engine()))
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.get("/api/analytics")
+async def list_analytics():
+    from utils.analytics import QUERIES
+
+    return {name: defaults for name, (_, defaults) in QUERIES.items()}
+
+@app.get("/api/analytics/{name}")
+async def get_analytics(request: Request, name: str):
+    fmt = negotiate(request, ANALYTICS_FORMATS, "json")
+    if fmt is None:
+        return not_acceptable(ANALYTICS_FORMATS)
+    params = {k: v for k, v in request.query_params.items() if k != "format"}
+
+    async def build():
+        table = await run_analytics(lambda engine: engine.named(name, params))
+        return encode_table(fmt, table)
+
+    return await cached_response(request, build, fmt)
+
+@app.post("/api/analytics/sql")
+async def post_analytics_sql(request: Request):
+    if not ANALYTICS_SQL_ENABLED:
+        raise HTTPException(status_code=403, detail="Set HONEYPOT_ANALYTICS_SQL=1 to allow ad-hoc SQL")
+    fmt = negotiate(request, ANALYTICS_FORMATS, "json")
+    if fmt is None:
+        return not_acceptable(ANALYTICS_FORMATS)
+    body = await request.json()
+    if not isinstance(body, dict) or not isinstance(body.get("sql"), str):
+        raise HTTPException(status_code=400, detail='Expected {"sql": "...", "params": {...}}')
+    table = await run_analytics(lambda engine: engine.query(body["sql"], body.get("params")))
+    return Response(encode_table(fmt, table), media_type=MEDIA_TYPES[fmt])
+
+@app.get("/api/export-csv")
+async def export_csv(request: Request):
+    # Full-table export. CSV by default; bulk consumers can ask for
+    # ?format=arrow|parquet|msgpack|json (or the matching Accept header).
+    allowed = ("csv",) + ROW_FORMATS
+    fmt = negotiate(request, allowed, "csv")
+    if fmt is None:
+        return not_acceptable(allowed)
+
+    # Too big to keep in the cache, but an unchanged table still gets a 304
+    etag = make_etag(f"{request.url.path}#{fmt}", await current_data_version())
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-    if not attacks:
+    async with AsyncSessionLocal() as session:
+        empty = (await session.execute(select(attacks_table.c.id).limit(1))).first() is None
+    if empty:
         return {"message": "No data to export"}
 
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=object_as_dict(attacks[0]).keys())
-    writer.writeheader()
-    for a in attacks:
-        writer.writerow(object_as_dict(a))
+    async def batches():
+        # Rows are pulled and encoded one partition at a time, never the whole table
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(select(attacks_table).order_by(attacks_table.c.timestamp.desc()))
+            async for rows in result.partitions(EXPORT_BATCH_ROWS):
+                yield rows
 
-    output.seek(0)
+    extension = {"arrow": "arrows", "msgpack": "msgpack"}.get(fmt, fmt)
     return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=attacks.csv"}
-    )
\ No newline at end of file
+        stream_rows(fmt, attacks_table.columns, batches()),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=attacks.{extension}", "ETag": etag, "Vary": "Accept"}
+    )
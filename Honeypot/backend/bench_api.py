@@ -0,0 +1,143 @@
+# backend/bench_api.py — concurrent throughput: async endpoints vs the old threadpool model
+#
+# Needs httpx (ASGI transport), which the server itself doesn't:
+#   pip install -r requirements.txt -r requirements-dev.txt
+#
+# Usage:
+#   python bench_api.py                      # 1000 requests, 32 concurrent clients
+#   python bench_api.py --requests 5000 --concurrency 256 --rows 20000
+#
+# Runs against a scratch copy of the DB (seeded with fake rows) so the real
+# database.db is never touched. The async API is measured twice: with the
+# response cache off (the same work per request as the threadpool baseline)
+# and on (every request after the first is a cache hit while nothing writes).
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def prepare_db():
+    tmp_dir = tempfile.mkdtemp(prefix="honeypot-bench-")
+    db_path = os.path.join(tmp_dir, "database.db")
+    src = os.path.join(BASE_DIR, "database.db")
+    if os.path.exists(src):
+        shutil.copy(src, db_path)
+    os.environ["HONEYPOT_DB_PATH"] = db_path
+    return tmp_dir
+
+
+def seed(rows):
+    from database import SessionLocal, Attack, init_db
+
+    init_db()
+    session = SessionLocal()
+    try:
+        have = session.query(Attack).count()
+        missing = max(0, rows - have)
+        users = ["root", "admin", "ubnt", "pi", "user", "oracle"]
+        session.bulk_save_objects([
+            Attack(
+                src_ip=f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}",
+                src_port=random.randint(1024, 65535),
+                username=random.choice(users),
+                password="123456",
+                country=random.choice(["India", "Internet", "China", "Russia"]),
+                flow_duration=random.random() * 1e6,
+                flow_bytes_s=random.random() * 1e4,
+                average_packet_size=random.random() * 100,
+            )
+            for _ in range(missing)
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+
+def build_threadpool_app():
+    """Same endpoints as api.py used to have: sync def + SessionLocal per request."""
+    from fastapi import FastAPI
+    from sqlalchemy import inspect
+    from database import SessionLocal, Attack
+
+    legacy = FastAPI()
+
+    @legacy.get("/api/attacks")
+    def get_attacks():
+        session = SessionLocal()
+        try:
+            attacks = session.query(Attack).order_by(Attack.timestamp.desc()).limit(500).all()
+            return [{c.key: getattr(a, c.key) for c in inspect(a).mapper.column_attrs} for a in attacks]
+        finally:
+            session.close()
+
+    return legacy
+
+
+async def run(app, path, total, concurrency):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(path)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        await one()  # warm up pools
+        latencies.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "req_s": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API throughput under concurrent load")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=5000, help="seed the scratch DB up to this many attacks")
+    args = parser.parse_args()
+
+    tmp_dir = prepare_db()
+    try:
+        seed(args.rows)
+        import api
+        from database import async_engine
+        from utils.cache import ResponseCache
+
+        path = "/api/attacks"
+        cached = api.response_cache
+        print(f"{args.requests} x GET {path}, concurrency={args.concurrency}, rows={args.rows}")
+        for name, target, cache in [
+            ("threadpool (sync def)", build_threadpool_app(), None),
+            ("async, cache off", api.app, ResponseCache(maxsize=0)),
+            ("async, cache on", api.app, cached),
+        ]:
+            if cache is not None:
+                api.response_cache = cache
+            res = asyncio.run(run(target, path, args.requests, args.concurrency))
+            print(f"  {name:<24} {res['req_s']:8.1f} req/s   p50 {res['p50_ms']:7.1f} ms   p99 {res['p99_ms']:7.1f} ms")
+        asyncio.run(async_engine.dispose())
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# backend/bench_ingest.py — localhost fleet test: N sensors shipping to one collector
+#
+# Usage:
+#   python bench_ingest.py                                  # 4 sensors, 2000 attacks/s each, 20 s
+#   python bench_ingest.py --sensors 8 --rate 5000 --seconds 30
+#   python bench_ingest.py --outage 5                       # kill the collector for 5 s mid-run
+#
+# Every process gets its own scratch database, so nothing real is touched.
+# Sensors insert synthetic attacks into their local DB (as honeypot.py would)
+# and run the same Shipper as sensor mode. At the end the collector's table
+# is checked against what the sensors wrote — no row lost or duplicated —
+# and ingest throughput and end-to-end lag (attack timestamp → collector
+# commit) are reported.
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_collector(tmp_dir, port):
+    env = dict(os.environ, HONEYPOT_DB_PATH=os.path.join(tmp_dir, "collector.db"))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "collector:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/ingest/stats", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("Collector did not start")
+
+
+def sensor_worker(rate, seconds, ship_interval):
+    """Runs in a child process: write attacks locally at `rate`/s and ship them."""
+    from sqlalchemy import insert
+    from database import SessionLocal, Attack, init_db
+    from utils.shipper import Shipper
+
+    init_db()
+    shipper = Shipper(SessionLocal)
+    users = ["root", "admin", "ubnt", "pi", "user", "oracle"]
+    written = 0
+    start = time.time()
+    next_ship = start
+    while time.time() - start < seconds:
+        tick = time.time()
+        due = int((tick - start) * rate) - written
+        if due > 0:
+            session = SessionLocal()
+            session.execute(insert(Attack.__table__), [
+                {
+                    "src_ip": f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}",
+                    "src_port": random.randint(1024, 65535),
+                    "username": random.choice(users),
+                    "password": "123456",
+                    "country": "Internet",
+                    "flow_duration": random.random() * 1e6,
+                    "total_fwd_packets": random.randint(1, 30),
+                }
+                for _ in range(due)
+            ])
+            session.commit()
+            session.close()
+            written += due
+        if tick >= next_ship:
+            shipper.ship_pending()
+            next_ship = tick + ship_interval
+        time.sleep(0.01)
+
+    # Drain whatever is still spooled (e.g. after an outage)
+    deadline = time.time() + 60
+    while shipper.backlog() and time.time() < deadline:
+        shipper.ship_pending() or time.sleep(0.5)
+    print(json.dumps({"written": written, "backlog": shipper.backlog()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet ingestion test on localhost")
+    parser.add_argument("--sensors", type=int, default=4)
+    parser.add_argument("--rate", type=int, default=2000, help="attacks per second per sensor")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--ship-interval", type=float, default=1.0)
+    parser.add_argument("--outage", type=float, default=0, help="stop the collector this long, a third of the way in")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sensor_worker(args.rate, args.seconds, args.ship_interval)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix="honeypot-fleet-")
+    port = free_port()
+    collector = start_collector(tmp_dir, port)
+    sensors = []
+    try:
+        t0 = time.time()
+        for i in range(args.sensors):
+            env = dict(
+                os.environ,
+                HONEYPOT_DB_PATH=os.path.join(tmp_dir, f"sensor{i}.db"),
+                HONEYPOT_COLLECTOR_URL=f"http://127.0.0.1:{port}",
+                HONEYPOT_SENSOR_ID=f"sensor{i}",
+            )
+            cmd = [sys.executable, __file__, "--worker", "--rate", str(args.rate),
+                   "--seconds", str(args.seconds), "--ship-interval", str(args.ship_interval)]
+            sensors.append(subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, text=True))
+
+        if args.outage:
+            time.sleep(args.seconds / 3)
+            print(f"Stopping collector for {args.outage}s...")
+            collector.terminate()
+            collector.wait()
+            time.sleep(args.outage)
+            collector = start_collector(tmp_dir, port)
+            print("Collector back")
+
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in sensors]
+        elapsed = time.time() - t0
+        stats = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/ingest/stats").read())
+    finally:
+        for p in sensors:
+            if p.poll() is None:
+                p.kill()
+        collector.terminate()
+        collector.wait()
+
+    db = sqlite3.connect(os.path.join(tmp_dir, "collector.db"))
+    per_sensor = dict(db.execute("SELECT sensor_id, COUNT(*) FROM attacks GROUP BY sensor_id").fetchall())
+    db.close()
+    written = sum(r["written"] for r in results)
+    received = sum(per_sensor.values())
+
+    print(f"\n{args.sensors} sensors × {args.rate} attacks/s for {args.seconds:.0f}s")
+    print(f"Written by sensors:   {written}")
+    print(f"Stored by collector:  {received}  ({'OK' if received == written else 'MISMATCH'})")
+    for i, r in enumerate(results):
+        sid = f"sensor{i}"
+        print(f"  {sid}: wrote {r['written']}, stored {per_sensor.get(sid, 0)}, still spooled {r['backlog']}")
+    print(f"Ingest throughput:    {received / elapsed:,.0f} rows/s end to end")
+    lags = [s for s in stats["sensors"].values() if s["lag_mean_s"] is not None]
+    if lags:
+        print(f"Lag (last 60 s):      mean {sum(s['lag_mean_s'] for s in lags) / len(lags):.2f}s, "
+              f"max {max(s['lag_max_s'] for s in lags):.2f}s")
+    print(f"Compressed bytes/row: {sum(s['compressed_bytes'] for s in stats['sensors'].values()) / max(received, 1):.1f}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# backend/classify_flows.py — score unlabeled attacks with a persisted flow model
+#
+# The honeypot and pcap_replay.py write rows with label NULL. This job reads
+# them in large batches straight into a NumPy matrix of the CIC flow features,
+# runs the model once per batch, and writes label + label_confidence back with
+# one executemany UPDATE per batch. A checkpoint (highest attacks.id scored)
+# commits in the same transaction, so every row is scored exactly once even if
+# the job is killed halfway.
+#
+# Train a model from CIC-IDS style CSVs (column names like " Flow Duration", " Label"):
+#   python classify_flows.py train MachineLearningCVE/*.csv
+# Score new rows once, or keep following the table:
+#   python classify_flows.py score
+#   python classify_flows.py score --follow 5
+#
+# Inference is pinned to one core (n_jobs=1) so the job never competes with the
+# honeypot for more than that; ~20k rows per batch keeps the per-call overhead
+# of predict_proba and SQLite negligible. "score" prints rows/s per batch.
+# Small batches (the usual case with --follow, a few new flows per poll) go
+# through utils/forest_kernel.py instead, which gives the same probabilities
+# without sklearn's ~6 ms per-call overhead.
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.environ.get("HONEYPOT_FLOW_MODEL", os.path.join(BASE_DIR, "models", "flow_model.joblib"))
+CHECKPOINT_NAME = "classifier"
+BATCH_ROWS = 20_000
+COMPILED_MAX_ROWS = 1000  # above this sklearn's own tree walk is faster (see forest_kernel --bench)
+
+# Same names as the Attack columns (and CIC-IDS headers once normalized)
+FEATURES = [
+    "destination_port", "flow_duration",
+    "total_fwd_packets", "total_backward_packets", "total_length_fwd_packets", "total_length_bwd_packets",
+    "fwd_packet_length_max", "fwd_packet_length_mean", "fwd_packet_length_std",
+    "bwd_packet_length_max", "bwd_packet_length_mean", "bwd_packet_length_std",
+    "flow_bytes_s", "flow_packets_s",
+    "flow_iat_mean", "flow_iat_std", "flow_iat_max",
+    "fwd_iat_mean", "fwd_iat_std", "fwd_iat_max",
+    "bwd_iat_mean", "bwd_iat_std", "bwd_iat_max",
+    "syn_flag_count", "ack_flag_count", "psh_flag_count", "fin_flag_count",
+    "down_up_ratio", "average_packet_size", "avg_fwd_segment_size", "avg_bwd_segment_size",
+    "protocol", "packet_length_mean", "packet_length_std", "packet_length_variance",
+]
+# Not in every CIC-IDS release (MachineLearningCVE has no Protocol column);
+# filled with this value when a CSV lacks it. The honeypot only sees TCP.
+OPTIONAL_FEATURES = {"protocol": 6}
+# CIC-IDS gives durations and IATs in microseconds. The attacks table keeps
+# flow_duration in microseconds too, but the IATs in seconds (honeypot.py,
+# pcap_replay.py), so they are scaled here, the one place rows meet the model.
+SECONDS_FEATURES = [f for f in FEATURES if "_iat_" in f]
+_TO_CIC_UNITS = np.array([1e6 if f in SECONDS_FEATURES else 1.0 for f in FEATURES])
+
+
+def cic_column(name):
+    # " Total Length of Fwd Packets" -> "total_length_fwd_packets", "Flow Bytes/s" -> "flow_bytes_s"
+    name = re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+    return name.replace("_of_", "_")
+
+
+def _clean(X):
+    # CIC data (and our own flows) contain inf/NaN for zero-length flows
+    X = np.nan_to_num(X, nan=0.0, posinf=0.0, neginf=0.0)
+    return X.astype(np.float32, copy=False)
+
+
+# === Training ===
+
+def train(csv_paths, out=MODEL_PATH, n_estimators=100, max_depth=20):
+    import joblib
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    frames = []
+    for path in csv_paths:
+        df = pd.read_csv(path, low_memory=False)
+        df.columns = [cic_column(c) for c in df.columns]
+        for name, default in OPTIONAL_FEATURES.items():
+            if name not in df.columns:
+                print(f"{path}: no {name} column, using {default}")
+                df[name] = default
+        missing = [f for f in FEATURES + ["label"] if f not in df.columns]
+        if missing:
+            raise SystemExit(f"{path}: missing columns {', '.join(missing)}")
+        frames.append(df[FEATURES + ["label"]])
+    df = pd.concat(frames, ignore_index=True)
+
+    X = _clean(df[FEATURES].to_numpy(dtype=np.float64))
+    y = df["label"].astype(str).str.strip().to_numpy()
+    print(f"Training on {len(y)} flows, {len(set(y))} classes...")
+    model = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, class_weight="balanced", n_jobs=-1, random_state=42
+    )
+    model.fit(X, y)
+    model.set_params(n_jobs=1)  # scoring runs single-core next to the honeypot
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    joblib.dump({"model": model, "features": FEATURES, "trained_at": time.time()}, out)
+    print(f"Saved model to {out}")
+
+
+def load_model(path=MODEL_PATH):
+    import joblib
+
+    bundle = joblib.load(path)
+    if bundle["features"] != FEATURES:
+        raise SystemExit(f"{path} was trained on a different feature list — retrain it")
+    return bundle["model"]
+
+
+# === Scoring ===
+
+def read_unscored(conn, after, limit):
+    """(ids, X) for the next `limit` unlabeled rows past `after`, via the raw DB-API cursor."""
+    cur = conn.exec_driver_sql(
+        f"SELECT id, {', '.join(FEATURES)} FROM attacks WHERE id > ? AND label IS NULL ORDER BY id LIMIT ?",
+        (after, limit),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        return np.empty(0, np.int64), np.empty((0, len(FEATURES)), np.float32)
+    data = np.array(rows, dtype=np.float64)  # NULL -> nan
+    return data[:, 0].astype(np.int64), _clean(data[:, 1:] * _TO_CIC_UNITS)
+
+
+def score(session_factory, model, batch_rows=BATCH_ROWS, compiled=None):
+    """Score everything past the checkpoint. Returns (rows, seconds).
+
+    `compiled` is an optional CompiledForest of `model` used for small batches.
+    """
+    from sqlalchemy import bindparam, update
+    from database import Attack, Checkpoint, bump_data_version
+
+    table = Attack.__table__
+    write_back = (
+        update(table)
+        .where(table.c.id == bindparam("_id"))
+        .values(label=bindparam("_label"), label_confidence=bindparam("_conf"))
+    )
+    classes = model.classes_
+
+    total = 0
+    t_start = time.perf_counter()
+    session = session_factory()
+    try:
+        cp = session.get(Checkpoint, CHECKPOINT_NAME)
+        after = cp.last_id if cp else 0
+        while True:
+            t0 = time.perf_counter()
+            ids, X = read_unscored(session.connection(), after, batch_rows)
+            if not len(ids):
+                break
+            if compiled is not None and len(ids) <= COMPILED_MAX_ROWS:
+                proba = compiled.predict_proba(X)
+            else:
+                proba = model.predict_proba(X)
+            best = proba.argmax(axis=1)
+            labels = classes[best]
+            conf = proba[np.arange(len(best)), best]
+
+            session.execute(write_back, [
+                {"_id": i, "_label": str(lbl), "_conf": float(c)}
+                for i, lbl, c in zip(ids.tolist(), labels, conf.tolist())
+            ])
+            after = int(ids[-1])
+            session.merge(Checkpoint(name=CHECKPOINT_NAME, last_id=after))
+            bump_data_version(session)
+            session.commit()
+
+            total += len(ids)
+            print(f"  scored {len(ids)} rows up to id {after} ({len(ids) / (time.perf_counter() - t0):,.0f} rows/s)")
+            if len(ids) < batch_rows:
+                break
+    finally:
+        session.close()
+    return total, time.perf_counter() - t_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify honeypot flows with a persisted model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("train", help="fit a model on CIC-IDS style CSVs")
+    p.add_argument("csv", nargs="+")
+    p.add_argument("--out", default=MODEL_PATH)
+    p.add_argument("--trees", type=int, default=100)
+    p.add_argument("--max-depth", type=int, default=20)
+
+    p = sub.add_parser("score", help="label rows that have no label yet")
+    p.add_argument("--model", default=MODEL_PATH)
+    p.add_argument("--batch", type=int, default=BATCH_ROWS)
+    p.add_argument("--follow", type=float, metavar="SECONDS", help="keep running, polling this often")
+
+    args = parser.parse_args()
+    if args.command == "train":
+        train(args.csv, args.out, args.trees, args.max_depth)
+        return
+
+    from database import SessionLocal, init_db
+    from utils.forest_kernel import CompiledForest
+
+    init_db()
+    model = load_model(args.model)
+    compiled = CompiledForest.from_sklearn(model)
+    while True:
+        rows, seconds = score(SessionLocal, model, args.batch, compiled)
+        if rows:
+            print(f"Scored {rows} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/s)")
+        if not args.follow:
+            break
+        time.sleep(args.follow)
+
+
+if __name__ == "__main__":
+    main()
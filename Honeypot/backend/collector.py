@@ -0,0 +1,174 @@
+# backend/collector.py — central collector for a fleet of honeypot sensors
+#
+# Sensors (honeypot.py with HONEYPOT_COLLECTOR_URL set, see utils/shipper.py)
+# POST gzip'd msgpack column batches to /ingest. Each batch is bulk-inserted
+# into this host's database (HONEYPOT_DB_PATH) in one transaction, together
+# with the sensor's high-water mark, so a resent batch is acknowledged
+# without inserting anything twice. Point api.py at the same database to get
+# one dashboard for the whole fleet.
+#
+# The collector is the only writer of sketches and campaigns for this
+# database — don't also run honeypot.py against it.
+#
+# Run:
+#   HONEYPOT_DB_PATH=/srv/fleet.db uvicorn collector:app --host 0.0.0.0 --port 8100
+# Ingest throughput and end-to-end lag per sensor:
+#   curl localhost:8100/ingest/stats
+# Localhost test with several sensors: python bench_ingest.py
+import asyncio
+import bisect
+import gzip
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import msgpack
+from fastapi import FastAPI, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from database import SessionLocal, Attack, Checkpoint, bump_data_version, init_db
+from utils import campaigns
+from utils.logger import logger
+from utils.sketches import SketchStore
+
+SKETCH_FLUSH_SECONDS = 5
+CAMPAIGN_INTERVAL_SECONDS = 30
+STATS_WINDOW_SECONDS = 60
+
+attacks_table = Attack.__table__
+_datetime_columns = {c.name for c in attacks_table.columns if c.type.python_type is datetime}
+_write_lock = threading.Lock()  # SQLite has one writer anyway; this keeps batches from interleaving
+
+
+class SensorStats:
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.bytes = 0
+        self.last_seen = None
+        self.recent = deque()  # (time, rows, mean lag s, max lag s) within STATS_WINDOW_SECONDS
+
+    def record(self, rows, dupes, nbytes, lags):
+        # lags: lag of the oldest and newest row in the batch
+        now = time.time()
+        self.rows += rows
+        self.batches += 1
+        self.duplicates += dupes
+        self.bytes += nbytes
+        self.last_seen = now
+        if lags:
+            self.recent.append((now, rows, sum(lags) / len(lags), max(lags)))
+        while self.recent and self.recent[0][0] < now - STATS_WINDOW_SECONDS:
+            self.recent.popleft()
+
+    def summary(self):
+        n = sum(r[1] for r in self.recent)
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "duplicate_rows_dropped": self.duplicates,
+            "compressed_bytes": self.bytes,
+            "rows_per_s": n / STATS_WINDOW_SECONDS,
+            "lag_mean_s": sum(r[1] * r[2] for r in self.recent) / n if n else None,
+            "lag_max_s": max((r[3] for r in self.recent), default=None),
+            "last_seen_s_ago": time.time() - self.last_seen if self.last_seen else None,
+        }
+
+
+sensor_stats = {}
+
+
+def _sqlite_datetime(value):
+    # Sensor sends isoformat(); store it the way SQLAlchemy's SQLite DateTime does
+    # ("YYYY-MM-DD HH:MM:SS.ffffff") so ordering and range filters keep working
+    if not value:
+        return None
+    value = value.replace("T", " ")
+    return value if len(value) > 19 else value + ".000000"
+
+
+def store_batch(sensor_id, body):
+    """Decode one sensor batch and insert the rows we don't have yet. Returns the ack."""
+    columns = msgpack.unpackb(gzip.decompress(body))
+    ids = columns.pop("id")
+    names = [n for n in columns if n in attacks_table.c]
+    for name in _datetime_columns.intersection(names):
+        columns[name] = [_sqlite_datetime(v) for v in columns[name]]
+
+    checkpoint = f"sensor:{sensor_id}"
+    with _write_lock:
+        session = SessionLocal()
+        try:
+            cp = session.get(Checkpoint, checkpoint)
+            hwm = cp.last_id if cp else 0
+            # Sensors send rows in id order, so everything new is one slice at the end
+            start = bisect.bisect_right(ids, hwm)
+            new = len(ids) - start
+            if new:
+                # Raw executemany on tuples — SQLAlchemy's per-row parameter handling was half the cost
+                sql = "INSERT INTO attacks (%s, sensor_id) VALUES (%s)" % (", ".join(names), ", ".join("?" * (len(names) + 1)))
+                rows = list(zip(*(columns[n][start:] for n in names), [sensor_id] * new))
+                session.connection().exec_driver_sql(sql, rows)
+                session.merge(Checkpoint(name=checkpoint, last_id=ids[-1]))
+                bump_data_version(session)
+                session.commit()
+        finally:
+            session.close()
+
+    now = datetime.utcnow()
+    stamps = columns.get("timestamp", [])[start:]
+    lags = [(now - datetime.fromisoformat(t)).total_seconds() for t in (stamps[0], stamps[-1]) if t] if stamps else []
+    sensor_stats.setdefault(sensor_id, SensorStats()).record(new, len(ids) - new, len(body), lags)
+    return {"acked": max([hwm] + ids[-1:]), "inserted": new}
+
+
+async def _owner_loop(fn, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(fn)
+        except Exception:  # keep ingesting even if an aggregate pass fails
+            logger.exception(f"{getattr(fn, '__name__', fn)} failed, retrying next interval")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_in_threadpool(init_db)
+    sketches = SketchStore(SessionLocal)
+    await run_in_threadpool(sketches.catch_up)
+    tasks = [
+        asyncio.create_task(_owner_loop(sketches.flush, SKETCH_FLUSH_SECONDS)),
+        asyncio.create_task(_owner_loop(lambda: campaigns.process(SessionLocal), CAMPAIGN_INTERVAL_SECONDS)),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    await run_in_threadpool(sketches.flush)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.post("/ingest")
+async def ingest(request: Request, x_sensor_id: str = Header(...)):
+    body = await request.body()
+    try:
+        ack = await run_in_threadpool(store_batch, x_sensor_id, body)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # Bad batch — don't ack; the sensor narrows it down and quarantines the bad row
+        logger.warning(f"Rejected batch from {x_sensor_id}: {e}")
+        return JSONResponse({"detail": f"Unreadable batch: {e}"}, status_code=400)
+    return ack
+
+
+@app.get("/ingest/stats")
+async def ingest_stats():
+    sensors = {sid: s.summary() for sid, s in sensor_stats.items()}
+    return {
+        "sensors": sensors,
+        "total_rows": sum(s["rows"] for s in sensors.values()),
+        "rows_per_s": sum(s["rows_per_s"] for s in sensors.values()),
+    }
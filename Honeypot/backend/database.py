@@ -1,18 +1,50 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Float
+from sqlalchemy import create_engine, event, text, update, Column, Integer, String, DateTime, Text, Float, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "database.db")
+DB_PATH = os.environ.get("HONEYPOT_DB_PATH", os.path.join(BASE_DIR, "database.db"))
 
+# Reader pool for the API (async). Tune these if the dashboard has many viewers.
+DB_POOL_SIZE = int(os.environ.get("HONEYPOT_DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.environ.get("HONEYPOT_DB_MAX_OVERFLOW", "8"))
+DB_POOL_TIMEOUT = float(os.environ.get("HONEYPOT_DB_POOL_TIMEOUT", "30"))
+
+# Writer engine — used by honeypot.py (and by the API only for schema setup)
 engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _):
+    # WAL lets the API readers run while the honeypot is committing
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
+
+
+# Read-only async engine for the API. mode=ro means a bug in an endpoint
+# can never write, and aiosqlite keeps the event loop free while SQLite works.
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    poolclass=AsyncAdaptedQueuePool,  # aiosqlite defaults to NullPool (a new connection per request)
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
 class Attack(Base):
     __tablename__ = "attacks"
+    # AUTOINCREMENT: ids are never reused, even after utils/analytics.py has
+    # archived every row — checkpoints and the archive rely on that
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
@@ -48,6 +80,7 @@ class Attack(Base):
     flow_bytes_s = Column(Float, default=0.0)
     flow_packets_s = Column(Float, default=0.0)
 
+    # IATs are in seconds (CIC-IDS uses microseconds; classify_flows.py converts)
     flow_iat_mean = Column(Float, default=0.0)
     flow_iat_std = Column(Float, default=0.0)
     flow_iat_max = Column(Float, default=0.0)
@@ -75,8 +108,89 @@ class Attack(Base):
     packet_length_std = Column(Float, default=0.0)
     packet_length_variance = Column(Float, default=0.0)
 
-    label = Column(String, default="SSH-BruteForce")
+    # Filled in by classify_flows.py — NULL until the flow model has scored the row
+    label = Column(String, nullable=True)
+    label_confidence = Column(Float, nullable=True)
+
+    # Which honeypot host recorded it (set by collector.py; NULL for local rows)
+    sensor_id = Column(String, nullable=True)
+
+class DataVersion(Base):
+    # Single-row write counter. Writers bump it in the same transaction as
+    # their change so the API cache can tell when anything was modified.
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    counter = Column(Integer, nullable=False, default=0)
 
-# THIS LINE RECREATES THE TABLE WITH NEW SCHEMA
-Base.metadata.create_all(bind=engine)
-print("Database initialized with full CIC flow features!")
\ No newline at end of file
+def bump_data_version(session):
+    session.execute(update(DataVersion).where(DataVersion.id == 1).values(counter=DataVersion.counter + 1))
+
+class Checkpoint(Base):
+    # Highest attacks.id a background consumer has fully processed
+    __tablename__ = "checkpoints"
+
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SketchBucket(Base):
+    # Serialized sketches (see utils/sketches.py). day is "YYYY-MM-DD" (UTC) or "all".
+    __tablename__ = "sketch_buckets"
+
+    day = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+
+class Campaign(Base):
+    # Attacks from one src_ip with no gap longer than CAMPAIGN_GAP (see utils/campaigns.py)
+    __tablename__ = "campaigns"
+
+    id = Column(Integer, primary_key=True)
+    src_ip = Column(String, index=True)
+    country = Column(String)
+    start_ts = Column(DateTime, index=True)
+    end_ts = Column(DateTime, index=True)
+    first_attack_id = Column(Integer)
+    last_attack_id = Column(Integer)
+
+    attempts = Column(Integer, default=0)
+    sessions = Column(Integer, default=0)  # bursts separated by more than SESSION_GAP
+    duration_s = Column(Float, default=0.0)
+    unique_usernames = Column(Integer, default=0)
+    unique_passwords = Column(Integer, default=0)
+    unique_credentials = Column(Integer, default=0)
+    flow_stats = Column(Text)  # JSON: {feature: {mean, std, min, max}}
+
+    # Working set (credential sets, running stats) while the campaign is open; NULL once closed
+    state = Column(LargeBinary, nullable=True)
+
+def init_db(bind=None):
+    """
+    Create missing tables/columns and the data_version row. Idempotent; entry
+    points that write (honeypot, collector, classifier, ...) call it at
+    startup — importing this module never touches the database file.
+    """
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        conn.execute(text("INSERT OR IGNORE INTO data_version (id, counter) VALUES (1, 0)"))
+        # create_all doesn't add columns to an existing table
+        have = {r[1] for r in conn.execute(text("PRAGMA table_info(attacks)"))}
+        for col in Attack.__table__.columns:
+            if col.name not in have:
+                conn.execute(text(f"ALTER TABLE attacks ADD COLUMN {col.name} {col.type.compile(bind.dialect)}"))
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attacks'")).scalar()
+        if "AUTOINCREMENT" not in sql.upper():
+            _rebuild_attacks(conn)
+
+def _rebuild_attacks(conn):
+    # Tables created before AUTOINCREMENT was added: SQLite can't ALTER that in,
+    # so copy into a new table once. Copying the ids seeds sqlite_sequence.
+    for index in Attack.__table__.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    conn.execute(text("ALTER TABLE attacks RENAME TO attacks_old"))
+    Attack.__table__.create(conn)
+    names = ", ".join(c.name for c in Attack.__table__.columns)
+    conn.execute(text(f"INSERT INTO attacks ({names}) SELECT {names} FROM attacks_old ORDER BY id"))
+    conn.execute(text("DROP TABLE attacks_old"))
@@ -2,14 +2,36 @@
 #!/usr/bin/env python3
 from twisted.internet import reactor
 from twisted.internet.protocol import Factory, Protocol
-from database import SessionLocal, Attack
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+from database import SessionLocal, Attack, bump_data_version, init_db
 from utils.geo import get_location
 from utils.logger import logger
+from utils.sketches import SketchStore
+from utils import campaigns
+from utils.offenders import OffenderIndex
+from utils.shipper import COLLECTOR_URL, Shipper
+from datetime import datetime
+import os
 import random
 import time
 import statistics
 import struct
 
+# Sketches (unique IPs / top-K) are written to the DB this often, not per attack
+SKETCH_FLUSH_SECONDS = 5
+# Campaign aggregates only need to be roughly current
+CAMPAIGN_INTERVAL_SECONDS = 30
+# Repeat-offender index folds in rows from other writers this often, and is
+# snapshotted to disk every OFFENDER_SNAPSHOT_SECONDS (and on shutdown)
+OFFENDER_FOLD_SECONDS = 30
+OFFENDER_SNAPSHOT_SECONDS = 300
+# Hold back the banner for IPs with at least this many prior attacks (0 = off)
+TARPIT_AFTER = int(os.environ.get("HONEYPOT_TARPIT_AFTER", "0"))
+TARPIT_SECONDS = float(os.environ.get("HONEYPOT_TARPIT_SECONDS", "10"))
+# Sensor mode (HONEYPOT_COLLECTOR_URL set): ship new rows to the collector this often
+SHIP_INTERVAL_SECONDS = 1
+
 class RealHoneypot(Protocol):
     def __init__(self):
         self.start_time = None
@@ -20,6 +42,8 @@ class RealHoneypot(Protocol):
         self.bwd_bytes = 0
         self.ip = None
         self.port = None
+        self.prior_attacks = 0
+        self.delayed_banner = None
 
     def connectionMade(self):
         self.start_time = time.time()
@@ -29,8 +53,19 @@ class RealHoneypot(Protocol):
         self.fwd_packets = []  # timestamps of forward packets
         self.bwd_packets = []  # backward (our responses)
 
-        logger.info(f"Connection from {self.ip}:{self.port}")
+        self.prior_attacks = self.factory.offenders.hits(self.ip)
+        if self.prior_attacks:
+            logger.info(f"Connection from {self.ip}:{self.port} (repeat offender, {self.prior_attacks} prior attacks)")
+        else:
+            logger.info(f"Connection from {self.ip}:{self.port}")
 
+        if TARPIT_AFTER and self.prior_attacks >= TARPIT_AFTER:
+            self.delayed_banner = reactor.callLater(TARPIT_SECONDS, self.sendBanner)
+        else:
+            self.sendBanner()
+
+    def sendBanner(self):
+        self.delayed_banner = None
         # Send SSH banner (this counts as backward packet)
         banner = b"SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.10\r\n"
         self.transport.write(banner)
@@ -49,6 +84,8 @@ class RealHoneypot(Protocol):
         # For real flags, we'd need raw socket — but we can infer some
 
     def connectionLost(self, reason):
+        if self.delayed_banner is not None:
+            self.delayed_banner.cancel()
         end_time = time.time()
         duration_sec = end_time - self.start_time
         duration_usec = duration_sec * 1_000_000
@@ -106,8 +143,10 @@ class RealHoneypot(Protocol):
         down_up_ratio = total_bwd_pkts / total_fwd_pkts if total_fwd_pkts > 0 else 0
 
         # Save to DB
+        now = datetime.utcnow()
         session = SessionLocal()
         attack = Attack(
+            timestamp=now,
             src_ip=self.ip,
             src_port=self.port,
             username=username,
@@ -164,18 +203,62 @@ class RealHoneypot(Protocol):
             packet_length_std=statistics.stdev(all_packet_lengths) if len(all_packet_lengths) > 1 else 0,
             packet_length_variance=statistics.variance(all_packet_lengths) if len(all_packet_lengths) > 1 else 0,
 
-            label="SSH-BruteForce"
+            label=None  # classify_flows.py scores it from the flow features
         )
         session.add(attack)
+        session.flush()
+        attack_id = attack.id
+        bump_data_version(session)
         session.commit()
         session.close()
 
+        self.factory.sketches.add(attack_id, now, self.ip, username, password, loc.get("country", "Unknown"))
+        self.factory.offenders.add(self.ip, attack_id)
+
         logger.info(f"BRUTE-FORCE ATTACK LOGGED → {self.ip} | {username}:{password} | {loc.get('country', 'Unknown')} | Duration: {duration_sec:.2f}s")
 
+def in_background(name, fn, *args):
+    """Run periodic DB work in a worker thread for a LoopingCall.
+
+    Errors are logged and swallowed, so a transient failure (e.g. "database
+    is locked") doesn't fail the Deferred and stop the loop for good.
+    """
+    def run():
+        try:
+            return fn(*args)
+        except Exception:
+            logger.exception(f"{name} failed, retrying next interval")
+    return deferToThread(run)
+
 class HoneypotFactory(Factory):
     protocol = RealHoneypot
 
+    def __init__(self):
+        self.sketches = SketchStore(SessionLocal)
+        self.offenders = OffenderIndex.load()
+
 if __name__ == "__main__":
+    init_db()
     logger.info("ADVANCED HONEYPOT STARTED — FULL CIC FLOW FEATURES ENABLED")
-    reactor.listenTCP(2222, HoneypotFactory())
+    factory = HoneypotFactory()
+    caught_up = factory.sketches.catch_up()
+    if caught_up:
+        logger.info(f"Sketches caught up on {caught_up} attacks")
+    LoopingCall(in_background, "Sketch flush", factory.sketches.flush).start(SKETCH_FLUSH_SECONDS, now=False)
+    # Final flush in a worker too; its flush_lock waits for a periodic one still running,
+    # and the reactor waits for the returned Deferred before shutting down
+    reactor.addSystemEventTrigger("before", "shutdown", in_background, "Final sketch flush", factory.sketches.flush)
+    LoopingCall(in_background, "Campaign update", campaigns.process, SessionLocal).start(CAMPAIGN_INTERVAL_SECONDS)
+    caught_up = factory.offenders.catch_up(SessionLocal)
+    logger.info(f"Repeat-offender index: {caught_up} attacks since snapshot, {factory.offenders.stats()}")
+    LoopingCall(in_background, "Offender catch-up", factory.offenders.catch_up, SessionLocal).start(OFFENDER_FOLD_SECONDS, now=False)
+    LoopingCall(in_background, "Offender snapshot", factory.offenders.save).start(OFFENDER_SNAPSHOT_SECONDS, now=False)
+    reactor.addSystemEventTrigger("before", "shutdown", in_background, "Final offender snapshot", factory.offenders.save)
+    if COLLECTOR_URL:
+        # Off the reactor thread so a slow or dead collector never stalls connections;
+        # an unexpected error is logged and the next interval tries again
+        shipper = Shipper(SessionLocal)
+        logger.info(f"Sensor mode: shipping to {COLLECTOR_URL} as {shipper.sensor_id} ({shipper.backlog()} rows spooled)")
+        LoopingCall(in_background, "Shipping", shipper.ship_pending).start(SHIP_INTERVAL_SECONDS)
+    reactor.listenTCP(2222, factory)
     reactor.run()
\ No newline at end of file
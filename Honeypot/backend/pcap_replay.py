@@ -0,0 +1,493 @@
+# backend/pcap_replay.py — rebuild honeypot flow records from packet captures
+#
+# Usage (from backend/):
+#   python pcap_replay.py capture.pcap [more.pcapng ...]      # extract flows + bulk-load into the DB
+#   python pcap_replay.py capture.pcap --port 2222 --dry-run   # only flows touching port 2222, no writes
+#   python pcap_replay.py --bench --synthetic 50000            # benchmark on a generated capture
+#
+# Unlike RealHoneypot (which only sees application-level callbacks) this sees
+# every TCP segment, so packet counts, payload lengths, IATs and the
+# SYN/ACK/PSH/FIN flag counts are exact.
+#
+# How it stays fast: the capture is mmap'ed and walked once in Python just to
+# find where each packet starts. Everything after that — Ethernet/IP/TCP
+# header decoding, flow assembly and the feature maths — is NumPy over whole
+# arrays, with no per-packet Python code.
+#
+# Flows are bidirectional 5-tuples. "Forward" is the direction of the first
+# packet seen (normally the SYN). A flow ends after FLOW_IDLE_TIMEOUT seconds
+# of silence, or when a new SYN shows up after a FIN/RST on the same tuple
+# (port reuse). Units follow what honeypot.py stores: flow_duration in
+# microseconds, IATs in seconds, packet lengths = TCP payload bytes. CIC-IDS
+# has IATs in microseconds; classify_flows.py converts when it scores a row.
+import argparse
+import ipaddress
+import mmap
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+FLOW_IDLE_TIMEOUT = 120.0
+INSERT_BATCH = 5000
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+RAW_LINKTYPES = (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6, 12, 14)  # 12/14 = DLT_RAW on BSD/OpenBSD
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_PSH, TCP_ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+
+
+# === Capture readers ===
+# Both return (buf, offsets, caplens, timestamps, linktypes, ts_base): one
+# array entry per packet, buf is the whole file as a read-only uint8 array.
+# Timestamps are seconds since ts_base (whole epoch seconds) — absolute epoch
+# floats only resolve ~0.2 µs, which is too coarse for IATs.
+
+def read_capture(path):
+    if os.path.getsize(path) < 24:
+        raise ValueError(f"{path}: too short to be a capture file")
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    if mm[:4] == b"\x0a\x0d\x0d\x0a":
+        return (buf,) + _read_pcapng(mm, buf)
+    return (buf,) + _read_pcap(mm, buf)
+
+
+def _gather(buf, positions, width):
+    """(n, width) uint8 matrix of the bytes at each position."""
+    return buf[positions[:, None] + np.arange(width)]
+
+
+def _read_pcap(mm, buf):
+    magic_le = struct.unpack_from("<I", mm, 0)[0]
+    if magic_le in (0xA1B2C3D4, 0xA1B23C4D):
+        endian, magic = "<", magic_le
+    else:
+        endian, magic = ">", struct.unpack_from(">I", mm, 0)[0]
+        if magic not in (0xA1B2C3D4, 0xA1B23C4D):
+            raise ValueError("Not a pcap or pcapng file")
+    frac_scale = 1e-9 if magic == 0xA1B23C4D else 1e-6
+    linktype = struct.unpack_from(endian + "I", mm, 20)[0] & 0x0FFFFFFF
+
+    # The only sequential part: hop from record header to record header
+    incl_len = struct.Struct(endian + "I").unpack_from
+    size = len(mm)
+    pos = 24
+    offsets = []
+    while pos + 16 <= size:
+        incl = incl_len(mm, pos + 8)[0]
+        if pos + 16 + incl > size:
+            break  # truncated last record
+        offsets.append(pos + 16)
+        pos += 16 + incl
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    hdr = np.ascontiguousarray(_gather(buf, offsets - 16, 16)).view(endian + "u4")
+    base = int(hdr[:, 0].min()) if len(hdr) else 0
+    ts = (hdr[:, 0].astype(np.int64) - base) + hdr[:, 1].astype(np.float64) * frac_scale
+    caplen = hdr[:, 2].astype(np.int64)
+    return offsets, caplen, ts, np.full(len(offsets), linktype, dtype=np.int64), base
+
+
+def _read_pcapng(mm, buf):
+    size = len(mm)
+    pos = 0
+    endian = "<"
+    interfaces = []  # (linktype, seconds per tick) for the current section
+    offsets, ifaces = [], []
+    iface_base = 0   # interface ids restart in every section
+    all_ifaces = []
+
+    while pos + 12 <= size:
+        btype = struct.unpack_from(endian + "I", mm, pos)[0]
+        if btype == 0x0A0D0D0A:  # Section Header: byte order can change here
+            endian = "<" if struct.unpack_from("<I", mm, pos + 8)[0] == 0x1A2B3C4D else ">"
+            iface_base = len(all_ifaces)
+            interfaces = []
+        blen = struct.unpack_from(endian + "I", mm, pos + 4)[0]
+        if blen < 12 or pos + blen > size:
+            break
+
+        if btype == 1:  # Interface Description
+            linktype = struct.unpack_from(endian + "H", mm, pos + 8)[0]
+            tick = 1e-6
+            opt = pos + 16
+            while opt + 4 <= pos + blen - 4:
+                code, olen = struct.unpack_from(endian + "HH", mm, opt)
+                if code == 0:
+                    break
+                if code == 9 and olen >= 1:  # if_tsresol
+                    res = mm[opt + 4]
+                    tick = 2.0 ** -(res & 0x7F) if res & 0x80 else 10.0 ** -res
+                opt += 4 + ((olen + 3) & ~3)
+            interfaces.append((linktype, tick))
+            all_ifaces.append((linktype, tick))
+        elif btype == 6:  # Enhanced Packet
+            iface = struct.unpack_from(endian + "I", mm, pos + 8)[0]
+            if iface < len(interfaces):
+                offsets.append(pos + 28)
+                ifaces.append(iface_base + iface)
+        # Simple Packet Blocks carry no timestamp, so they can't be put into flows — skipped
+        pos += blen
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    ifaces = np.asarray(ifaces, dtype=np.int64)
+    hdr = np.ascontiguousarray(_gather(buf, offsets - 16, 12)).view(endian + "u4")  # ts_hi, ts_lo, caplen
+    ticks = (hdr[:, 0].astype(np.uint64) << np.uint64(32)) | hdr[:, 1].astype(np.uint64)
+    if_linktype = np.array([lt for lt, _ in all_ifaces] or [0], dtype=np.int64)
+    if_tick = np.array([t for _, t in all_ifaces] or [1e-6], dtype=np.float64)
+    # Split ticks into whole seconds + remainder per interface resolution
+    tick = if_tick[ifaces]
+    per_sec = np.round(1.0 / tick).astype(np.uint64)
+    secs = (ticks // per_sec).astype(np.int64)
+    base = int(secs.min()) if len(secs) else 0
+    ts = (secs - base) + (ticks % per_sec).astype(np.float64) * tick
+    caplen = hdr[:, 2].astype(np.int64)
+    return offsets, caplen, ts, if_linktype[ifaces], base
+
+
+# === Header decoding ===
+
+def _be16(buf, pos):
+    return (buf[pos].astype(np.int64) << 8) | buf[pos + 1]
+
+
+def decode_tcp(buf, offsets, caplen, ts, linktype):
+    """Vectorized Ethernet/SLL/raw → IPv4/IPv6 → TCP decode. Non-TCP packets are dropped."""
+    last = len(buf) - 2
+    end = offsets + caplen
+    # Keep gathers (incl. the second byte of _be16) inside the buffer; values
+    # read past a packet's caplen are garbage that the masks below throw away
+    safe = lambda p: np.clip(p, 0, last)
+
+    l3 = np.full(len(offsets), -1, dtype=np.int64)
+    eth = (linktype == LINKTYPE_ETHERNET) & (caplen >= 14)
+    if eth.any():
+        etype = _be16(buf, safe(offsets + 12))
+        vlan = eth & ((etype == 0x8100) | (etype == 0x88A8)) & (caplen >= 18)
+        etype = np.where(vlan, _be16(buf, safe(offsets + 16)), etype)
+        l3 = np.where(eth & ((etype == 0x0800) | (etype == 0x86DD)), offsets + 14 + 4 * vlan, l3)
+    sll = linktype == LINKTYPE_LINUX_SLL
+    l3 = np.where(sll, offsets + 16, l3)
+    l3 = np.where(np.isin(linktype, RAW_LINKTYPES), offsets, l3)
+    l3 = np.where(linktype == LINKTYPE_NULL, offsets + 4, l3)
+
+    ok = (l3 >= 0) & (l3 + 20 <= end)
+    l3 = np.where(ok, l3, 0)
+    version = buf[safe(l3)] >> 4
+    v4 = ok & (version == 4)
+    v6 = ok & (version == 6) & (l3 + 40 <= end)
+
+    # IPv4: IHL, total length, protocol, fragment offset
+    ihl = (buf[safe(l3)] & 0x0F).astype(np.int64) * 4
+    frag = _be16(buf, safe(l3 + 6)) & 0x1FFF
+    v4 &= (buf[safe(l3 + 9)] == 6) & (frag == 0) & (ihl >= 20)
+    # IPv6: no extension-header chasing, TCP must be the next header
+    v6 &= buf[safe(l3 + 6)] == 6
+
+    l4 = np.where(v4, l3 + ihl, l3 + 40)
+    ip_total = np.where(v4, _be16(buf, safe(l3 + 2)), 40 + _be16(buf, safe(l3 + 4)))
+    tcp = (v4 | v6) & (l4 + 20 <= end)
+
+    idx = np.flatnonzero(tcp)
+    l3, l4, ip_total, v4 = l3[idx], l4[idx], ip_total[idx], v4[idx]
+
+    # Addresses as two uint64 halves; IPv4 goes in as ::ffff:a.b.c.d
+    src = np.zeros((len(idx), 2), dtype=np.uint64)
+    dst = np.zeros((len(idx), 2), dtype=np.uint64)
+    if v4.any():
+        p = l3[v4]
+        src4 = np.ascontiguousarray(_gather(buf, p + 12, 4)).view(">u4")[:, 0].astype(np.uint64)
+        dst4 = np.ascontiguousarray(_gather(buf, p + 16, 4)).view(">u4")[:, 0].astype(np.uint64)
+        mapped = np.uint64(0xFFFF << 32)
+        src[v4, 1] = mapped | src4
+        dst[v4, 1] = mapped | dst4
+    if (~v4).any():
+        p = l3[~v4]
+        src[~v4] = np.ascontiguousarray(_gather(buf, p + 8, 16)).view(">u8")
+        dst[~v4] = np.ascontiguousarray(_gather(buf, p + 24, 16)).view(">u8")
+
+    sport = _be16(buf, l4)
+    dport = _be16(buf, l4 + 2)
+    tcp_hlen = (buf[l4 + 12] >> 4).astype(np.int64) * 4
+    flags = buf[l4 + 13].astype(np.int64)
+    payload = np.maximum(ip_total - (l4 - l3) - tcp_hlen, 0)
+
+    return {
+        "ts": ts[idx], "src": src, "dst": dst, "sport": sport, "dport": dport,
+        "flags": flags, "payload": payload.astype(np.float64),
+    }
+
+
+# === Flow assembly + features ===
+
+def _segment_stats(group, values, n_groups):
+    """count, mean, sample std and max of `values` per group id."""
+    count = np.bincount(group, minlength=n_groups).astype(np.float64)
+    total = np.bincount(group, weights=values, minlength=n_groups)
+    sumsq = np.bincount(group, weights=values * values, minlength=n_groups)
+    safe_n = np.maximum(count, 1)
+    mean = total / safe_n
+    var = np.where(count > 1, np.maximum(sumsq - total * total / safe_n, 0) / np.maximum(count - 1, 1), 0.0)
+    mx = np.zeros(n_groups)
+    np.maximum.at(mx, group, values)
+    return count, total, mean, np.sqrt(var), mx, var
+
+
+def _iat_stats(group, ts, n_groups):
+    """IAT mean/std/max per group; packets must already be sorted by (group, ts)."""
+    same = group[1:] == group[:-1]
+    _, _, mean, std, mx, _ = _segment_stats(group[1:][same], np.diff(ts)[same], n_groups)
+    return mean, std, mx
+
+
+def extract_flows(pkts, idle_timeout=FLOW_IDLE_TIMEOUT, port=None):
+    """Packets from decode_tcp → dict of per-flow NumPy feature arrays."""
+    src, dst, sport, dport = pkts["src"], pkts["dst"], pkts["sport"], pkts["dport"]
+    if port is not None:
+        keep = (sport == port) | (dport == port)
+        pkts = {k: v[keep] for k, v in pkts.items()}
+        src, dst, sport, dport = pkts["src"], pkts["dst"], pkts["sport"], pkts["dport"]
+    ts, flags, plen = pkts["ts"], pkts["flags"], pkts["payload"]
+    if len(ts) == 0:
+        return None
+
+    # Direction-independent connection key: smaller endpoint first
+    a = np.column_stack([src, sport.astype(np.uint64)])
+    b = np.column_stack([dst, dport.astype(np.uint64)])
+    swap = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & ((a[:, 1] > b[:, 1]) | ((a[:, 1] == b[:, 1]) & (a[:, 2] > b[:, 2]))))
+    key = np.column_stack([np.where(swap[:, None], b, a), np.where(swap[:, None], a, b)])
+
+    # One sort groups packets by connection and orders each connection by time
+    order = np.lexsort((ts,) + tuple(key[:, i] for i in range(key.shape[1] - 1, -1, -1)))
+    key, ts, flags, plen = key[order], ts[order], flags[order], plen[order]
+    src, sport = src[order], sport[order]
+
+    n = len(ts)
+    idx = np.arange(n)
+    conn_start = np.ones(n, dtype=bool)
+    conn_start[1:] = (key[1:] != key[:-1]).any(axis=1)
+
+    # Split on idle gaps
+    gap = np.zeros(n, dtype=bool)
+    gap[1:] = (np.diff(ts) > idle_timeout) & ~conn_start[1:]
+
+    # Split on a bare SYN if a FIN/RST was seen since the previous bare SYN (port reuse)
+    syn_only = (flags & TCP_SYN).astype(bool) & ~(flags & TCP_ACK).astype(bool)
+    closed = np.cumsum((flags & (TCP_FIN | TCP_RST)).astype(bool))
+    group_first = np.maximum.accumulate(np.where(conn_start, idx, 0))
+    prev_syn = np.maximum.accumulate(np.where(syn_only, idx, -1))
+    prev_syn = np.concatenate([[-1], prev_syn[:-1]])
+    baseline_at = np.where(prev_syn >= group_first, prev_syn, group_first - 1)
+    baseline = np.where(baseline_at >= 0, closed[np.maximum(baseline_at, 0)], 0)
+    closed_before = np.concatenate([[0], closed[:-1]])
+    reuse = syn_only & ~conn_start & (closed_before > baseline)
+
+    starts = conn_start | gap | reuse
+    fid = np.cumsum(starts) - 1
+    nf = int(fid[-1]) + 1
+    first = np.flatnonzero(starts)
+    last = np.concatenate([first[1:] - 1, [n - 1]])
+
+    # Forward = same source endpoint as the flow's first packet
+    init_src, init_port = src[first], sport[first]
+    fwd = (src[:, 0] == init_src[fid, 0]) & (src[:, 1] == init_src[fid, 1]) & (sport == init_port[fid])
+
+    n_all, bytes_all, pl_mean, pl_std, _, pl_var = _segment_stats(fid, plen, nf)
+    n_fwd, bytes_fwd, fwd_mean, fwd_std, fwd_max, _ = _segment_stats(fid[fwd], plen[fwd], nf)
+    n_bwd, bytes_bwd, bwd_mean, bwd_std, bwd_max, _ = _segment_stats(fid[~fwd], plen[~fwd], nf)
+
+    flow_iat = _iat_stats(fid, ts, nf)
+    seg = fid * 2 + (~fwd)
+    by_dir = np.argsort(seg, kind="stable")  # keeps ts order inside each direction
+    dir_iat = _iat_stats(seg[by_dir], ts[by_dir], nf * 2)
+    fwd_iat = [s[0::2] for s in dir_iat]
+    bwd_iat = [s[1::2] for s in dir_iat]
+
+    duration = ts[last] - ts[first]
+    duration_sec = np.where(duration > 0, duration, 0.000001)  # same floor as honeypot.py
+    flag_count = lambda bit: np.bincount(fid, weights=(flags & bit).astype(bool), minlength=nf)
+
+    return {
+        "start_ts": ts[first],
+        "src": init_src, "src_port": init_port,
+        "dst_port": np.where(fwd[first], pkts["dport"][order][first], init_port),
+        "flow_duration": duration * 1_000_000,
+        "total_fwd_packets": n_fwd, "total_backward_packets": n_bwd,
+        "total_length_fwd_packets": bytes_fwd, "total_length_bwd_packets": bytes_bwd,
+        "fwd_packet_length_max": fwd_max, "fwd_packet_length_mean": fwd_mean, "fwd_packet_length_std": fwd_std,
+        "bwd_packet_length_max": bwd_max, "bwd_packet_length_mean": bwd_mean, "bwd_packet_length_std": bwd_std,
+        "flow_bytes_s": bytes_all / duration_sec, "flow_packets_s": n_all / duration_sec,
+        "flow_iat_mean": flow_iat[0], "flow_iat_std": flow_iat[1], "flow_iat_max": flow_iat[2],
+        "fwd_iat_mean": fwd_iat[0], "fwd_iat_std": fwd_iat[1], "fwd_iat_max": fwd_iat[2],
+        "bwd_iat_mean": bwd_iat[0], "bwd_iat_std": bwd_iat[1], "bwd_iat_max": bwd_iat[2],
+        "syn_flag_count": flag_count(TCP_SYN), "ack_flag_count": flag_count(TCP_ACK),
+        "psh_flag_count": flag_count(TCP_PSH), "fin_flag_count": flag_count(TCP_FIN),
+        "down_up_ratio": np.where(n_fwd > 0, n_bwd / np.maximum(n_fwd, 1), 0),
+        "average_packet_size": bytes_all / np.maximum(n_all, 1),
+        "avg_fwd_segment_size": fwd_mean, "avg_bwd_segment_size": bwd_mean,
+        "packet_length_mean": pl_mean, "packet_length_std": pl_std, "packet_length_variance": pl_var,
+    }
+
+
+INT_FEATURES = (
+    "total_fwd_packets", "total_backward_packets", "total_length_fwd_packets", "total_length_bwd_packets",
+    "syn_flag_count", "ack_flag_count", "psh_flag_count", "fin_flag_count",
+)
+
+
+def _ip_string(hi, lo):
+    addr = ipaddress.IPv6Address((int(hi) << 64) | int(lo))
+    return str(addr.ipv4_mapped or addr)
+
+
+def flows_to_rows(flows):
+    """Per-flow feature arrays → dicts ready for an executemany INSERT into attacks."""
+    from utils.geo import get_location
+
+    if flows is None:
+        return []
+    skip = {"start_ts", "src", "src_port", "dst_port"}
+    columns = {k: (v.astype(np.int64) if k in INT_FEATURES else v).tolist() for k, v in flows.items() if k not in skip}
+    ips = [_ip_string(hi, lo) for hi, lo in flows["src"]]
+    rows = []
+    for i, ip in enumerate(ips):
+        loc = get_location(ip)
+        row = {k: v[i] for k, v in columns.items()}
+        row.update(
+            timestamp=datetime.fromtimestamp(float(flows["start_ts"][i]), tz=timezone.utc).replace(tzinfo=None),
+            src_ip=ip,
+            src_port=int(flows["src_port"][i]),
+            destination_port=int(flows["dst_port"][i]),
+            username=None,
+            password=None,
+            command=None,
+            country=loc.get("country", "Unknown"),
+            country_code=loc.get("country_code", "XX"),
+            city=loc.get("city", "Unknown"),
+            latitude=loc.get("latitude"),
+            longitude=loc.get("longitude"),
+            protocol=6,
+            label=None,  # unknown until classify_flows.py scores it
+        )
+        rows.append(row)
+    return rows
+
+
+def load_rows(rows):
+    from sqlalchemy import insert
+    from database import SessionLocal, Attack, bump_data_version
+
+    session = SessionLocal()
+    try:
+        for i in range(0, len(rows), INSERT_BATCH):
+            session.execute(insert(Attack.__table__), rows[i:i + INSERT_BATCH])
+            bump_data_version(session)
+            session.commit()
+    finally:
+        session.close()
+
+
+def process_capture(path, port=None, idle_timeout=FLOW_IDLE_TIMEOUT):
+    timings = {}
+    t0 = time.perf_counter()
+    buf, offsets, caplen, ts, linktype, ts_base = read_capture(path)
+    t1 = time.perf_counter()
+    pkts = decode_tcp(buf, offsets, caplen, ts, linktype)
+    t2 = time.perf_counter()
+    flows = extract_flows(pkts, idle_timeout, port)
+    if flows is not None:
+        flows["start_ts"] = flows["start_ts"] + ts_base
+    t3 = time.perf_counter()
+    timings.update(index=t1 - t0, decode=t2 - t1, flows=t3 - t2, packets=len(offsets), tcp_packets=len(pkts["ts"]))
+    return flows, timings
+
+
+# === Synthetic captures for benchmarking ===
+
+def write_synthetic_pcap(path, n_flows, server_port=2222, seed=0):
+    """SSH brute-force-shaped sessions: handshake, banners, a few auth exchanges, FIN teardown."""
+    rng = np.random.default_rng(seed)
+    rec = struct.Struct("<IIII")
+    eth = b"\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\x08\x00"
+    server = bytes([192, 168, 1, 10])
+
+    def packet(t, sip, dip, sp, dp, fl, payload):
+        tcp = struct.pack(">HHIIBBHHH", sp, dp, 0, 0, 5 << 4, fl, 65535, 0, 0)
+        ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp) + len(payload), 0, 0x4000, 64, 6, 0, sip, dip)
+        frame = eth + ip + tcp + payload
+        sec = int(t)
+        return rec.pack(sec, int((t - sec) * 1e6), len(frame), len(frame)) + frame
+
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        t = 1_700_000_000.0
+        for i in range(n_flows):
+            client = bytes([10, int(rng.integers(0, 256)), int(rng.integers(0, 256)), int(rng.integers(1, 255))])
+            cport = int(rng.integers(1024, 65535))
+            up, down = (client, server, cport, server_port), (server, client, server_port, cport)
+            steps = [(up, TCP_SYN, b""), (down, TCP_SYN | TCP_ACK, b""), (up, TCP_ACK, b""),
+                     (down, TCP_PSH | TCP_ACK, b"SSH-2.0-OpenSSH_8.9p1\r\n"), (up, TCP_PSH | TCP_ACK, b"SSH-2.0-libssh\r\n")]
+            for _ in range(int(rng.integers(1, 6))):
+                steps += [(up, TCP_PSH | TCP_ACK, b"x" * int(rng.integers(40, 300))), (down, TCP_ACK, b"")]
+            steps += [(up, TCP_FIN | TCP_ACK, b""), (down, TCP_FIN | TCP_ACK, b""), (up, TCP_ACK, b"")]
+            for (sip, dip, sp, dp), fl, payload in steps:
+                f.write(packet(t, sip, dip, sp, dp, fl, payload))
+                t += float(rng.exponential(0.002))
+            t += float(rng.exponential(0.01))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract CIC flow features from pcap/pcapng files")
+    parser.add_argument("captures", nargs="*")
+    parser.add_argument("--port", type=int, help="only keep flows to/from this TCP port (e.g. 2222)")
+    parser.add_argument("--idle-timeout", type=float, default=FLOW_IDLE_TIMEOUT)
+    parser.add_argument("--dry-run", action="store_true", help="extract and report, don't write to the DB")
+    parser.add_argument("--bench", action="store_true", help="report throughput only (implies --dry-run)")
+    parser.add_argument("--synthetic", type=int, metavar="FLOWS", help="generate a capture with this many flows and use it")
+    args = parser.parse_args()
+
+    captures = list(args.captures)
+    tmp = None
+    if args.synthetic:
+        tmp = tempfile.NamedTemporaryFile(suffix=".pcap", delete=False)
+        tmp.close()
+        write_synthetic_pcap(tmp.name, args.synthetic)
+        captures.append(tmp.name)
+    if not captures:
+        parser.error("give at least one capture file (or --synthetic N)")
+
+    if not (args.bench or args.dry_run):
+        from database import init_db
+
+        init_db()
+    try:
+        for path in captures:
+            flows, t = process_capture(path, args.port, args.idle_timeout)
+            n_flows = 0 if flows is None else len(flows["start_ts"])
+            total = t["index"] + t["decode"] + t["flows"]
+            print(f"{path}: {t['packets']} packets ({t['tcp_packets']} TCP) → {n_flows} flows")
+            print(f"  index {t['index']*1000:.0f} ms, decode {t['decode']*1000:.0f} ms, flows {t['flows']*1000:.0f} ms"
+                  f"  = {t['packets'] / max(total, 1e-9):,.0f} packets/s")
+            if args.bench or args.dry_run or not n_flows:
+                continue
+            t0 = time.perf_counter()
+            rows = flows_to_rows(flows)
+            load_rows(rows)
+            print(f"  loaded {len(rows)} flows into the attacks table in {time.perf_counter() - t0:.2f}s")
+    finally:
+        if tmp:
+            os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+# backend/utils/analytics.py — embedded DuckDB engine over live + archived attacks
+#
+# One view, `attacks`, covers both the live SQLite table and monthly Parquet
+# files in HONEYPOT_ARCHIVE_DIR, so ad-hoc group-bys run in-process on a
+# vectorized, multi-threaded engine instead of exporting the table to pandas.
+# Parquet row-group min/max stats let filters on timestamp (the files are
+# sorted by it) skip whole months without reading them.
+#
+# Queries are read-only: a single SELECT, on a connection that can only read
+# the database file and the archive directory (DuckDB >= 1.2; older versions
+# run the named queries but refuse ad-hoc SQL), with a timeout and a memory
+# limit:
+#   HONEYPOT_ARCHIVE_DIR          default backend/archive
+#   HONEYPOT_ANALYTICS_MEMORY     DuckDB memory_limit, default 1GB
+#   HONEYPOT_ANALYTICS_THREADS    default 4
+#   HONEYPOT_ANALYTICS_TIMEOUT    seconds, default 10
+#
+# Python:
+#   from utils.analytics import query
+#   query("SELECT country, count(*) n FROM attacks WHERE timestamp >= $since GROUP BY 1 ORDER BY n DESC",
+#         {"since": "2025-01-01"}).to_pandas()
+#
+# The live table is read through DuckDB's sqlite extension (install it once:
+#   python -c "import duckdb; duckdb.execute('INSTALL sqlite')"
+# ). Without it (a warning is logged) the table is copied into DuckDB through
+# sqlite3: in full once, then new ids are appended in a background thread
+# when data_version changes, at most every REFRESH_SECONDS. Queries never wait
+# for that copy; they see the last one. Updates to old rows (labels) and
+# deletes only show up with the full recopy every FULL_REFRESH_SECONDS.
+#
+# A row that is both archived and still in SQLite (the default, or a failed
+# --delete) is counted once: archived rows whose id is live are skipped.
+# attacks.id is AUTOINCREMENT, so an id is never reused for a new row.
+#
+# Copy old rows into the archive, and with --delete remove them from SQLite
+# (run from backend/):
+#   python -m utils.analytics archive --before 2025-06-01 [--delete]
+# Only this engine reads the archive. After --delete, /api/stats, /api/attacks
+# and /api/export-csv cover what is left in SQLite; the sketches, campaigns
+# and /api/analytics still cover the whole history.
+#   python -m utils.analytics sql "SELECT label, count(*) FROM attacks GROUP BY 1"
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+import duckdb
+
+from database import BASE_DIR, DB_PATH
+
+ARCHIVE_DIR = os.environ.get("HONEYPOT_ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+MEMORY_LIMIT = os.environ.get("HONEYPOT_ANALYTICS_MEMORY", "1GB")
+THREADS = int(os.environ.get("HONEYPOT_ANALYTICS_THREADS", "4"))
+TIMEOUT_SECONDS = float(os.environ.get("HONEYPOT_ANALYTICS_TIMEOUT", "10"))
+MAX_ROWS = 100_000
+# Without DuckDB's sqlite extension the live table is copied in: new rows at
+# most this often, everything (to pick up updates and deletes) this often
+REFRESH_SECONDS = 5
+FULL_REFRESH_SECONDS = 300
+
+# Named queries for the API. Parameters are bound, never formatted into the SQL.
+QUERIES = {
+    "attacks_by_day": (
+        """SELECT date_trunc('day', timestamp) AS day, count(*) AS attacks, count(DISTINCT src_ip) AS unique_ips
+           FROM attacks WHERE timestamp >= CAST($since AS TIMESTAMP) AND timestamp < CAST($until AS TIMESTAMP)
+           GROUP BY 1 ORDER BY 1""",
+        {"since": "1970-01-01", "until": "9999-01-01"},
+    ),
+    "top_countries": (
+        """SELECT coalesce(country, 'Unknown') AS country, count(*) AS attacks, count(DISTINCT src_ip) AS unique_ips
+           FROM attacks WHERE timestamp >= CAST($since AS TIMESTAMP) AND timestamp < CAST($until AS TIMESTAMP)
+           GROUP BY 1 ORDER BY attacks DESC LIMIT CAST($limit AS INTEGER)""",
+        {"since": "1970-01-01", "until": "9999-01-01", "limit": 20},
+    ),
+    "top_credentials": (
+        """SELECT username, password, count(*) AS attempts, count(DISTINCT src_ip) AS unique_ips
+           FROM attacks WHERE timestamp >= CAST($since AS TIMESTAMP) AND timestamp < CAST($until AS TIMESTAMP)
+           GROUP BY 1, 2 ORDER BY attempts DESC LIMIT CAST($limit AS INTEGER)""",
+        {"since": "1970-01-01", "until": "9999-01-01", "limit": 20},
+    ),
+    "hourly_heatmap": (
+        """SELECT dayofweek(timestamp) AS weekday, hour(timestamp) AS hour, count(*) AS attacks
+           FROM attacks WHERE timestamp >= CAST($since AS TIMESTAMP) AND timestamp < CAST($until AS TIMESTAMP)
+           GROUP BY 1, 2 ORDER BY 1, 2""",
+        {"since": "1970-01-01", "until": "9999-01-01"},
+    ),
+    "labels": (
+        """SELECT coalesce(label, 'unscored') AS label, count(*) AS attacks, avg(label_confidence) AS avg_confidence
+           FROM attacks WHERE timestamp >= CAST($since AS TIMESTAMP) AND timestamp < CAST($until AS TIMESTAMP)
+           GROUP BY 1 ORDER BY attacks DESC""",
+        {"since": "1970-01-01", "until": "9999-01-01"},
+    ),
+    "flow_profile": (
+        """SELECT destination_port, count(*) AS flows,
+                  avg(flow_duration) AS avg_duration_us, quantile_cont(flow_duration, 0.95) AS p95_duration_us,
+                  avg(total_fwd_packets + total_backward_packets) AS avg_packets, avg(flow_bytes_s) AS avg_bytes_s
+           FROM attacks WHERE timestamp >= CAST($since AS TIMESTAMP) AND timestamp < CAST($until AS TIMESTAMP)
+           GROUP BY 1 ORDER BY flows DESC LIMIT CAST($limit AS INTEGER)""",
+        {"since": "1970-01-01", "until": "9999-01-01", "limit": 20},
+    ),
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+_warned_no_scanner = False
+
+
+def _read_live_arrow(db_path, after_id=0):
+    """Copy attacks with id > after_id into Arrow via sqlite3 (used when DuckDB can't load its sqlite extension)."""
+    import pyarrow as pa
+
+    from database import Attack
+    from utils.formats import arrow_schema
+
+    schema = arrow_schema(Attack.__table__.columns)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cur = conn.execute(f"SELECT {', '.join(schema.names)} FROM attacks WHERE id > ? ORDER BY id", (after_id,))
+        cols = list(zip(*cur.fetchall())) or [()] * len(schema)
+    finally:
+        conn.close()
+    arrays = []
+    for values, field in zip(cols, schema):
+        if pa.types.is_timestamp(field.type):
+            arrays.append(pa.array(values, pa.string()).cast(field.type))  # SQLite stores text
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _data_version(db_path):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT counter FROM data_version WHERE id = 1").fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+class AnalyticsEngine:
+    def __init__(self, db_path=DB_PATH, archive_dir=ARCHIVE_DIR, sandbox=True,
+                 memory_limit=MEMORY_LIMIT, threads=THREADS):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.lock = threading.Lock()  # view (re)definition and copy bookkeeping only; queries run on their own cursors
+        self.con = duckdb.connect(config={
+            "memory_limit": memory_limit,
+            "threads": threads,
+            "autoinstall_known_extensions": False,  # never reach for the network mid-query
+        })
+        self.archive_files = None
+        self.live_version = None
+        self.live_max_id = 0
+        self.live_loaded_at = 0  # last copy of any kind
+        self.live_full_at = 0    # last full copy
+        self.refreshing = None   # background copy thread, if one is running
+        try:
+            self.con.execute("LOAD sqlite")
+            self.con.execute(f"ATTACH '{db_path}' AS live (TYPE sqlite, READ_ONLY)")
+            self.con.execute("CREATE VIEW live_attacks AS SELECT * FROM live.attacks")
+            self.scanner = True
+        except duckdb.Error as e:
+            global _warned_no_scanner
+            if not _warned_no_scanner:
+                _warned_no_scanner = True
+                from utils.logger import logger
+
+                logger.warning(
+                    f"DuckDB sqlite extension unavailable ({e}); analytics will copy the live attacks table "
+                    "instead. Install it with: python -c \"import duckdb; duckdb.execute('INSTALL sqlite')\""
+                )
+            self.scanner = False
+            self._copy_live(_data_version(db_path), full=True)
+        self._refresh_archive()
+
+        self.sandboxed = False
+        if sandbox:
+            os.makedirs(archive_dir, exist_ok=True)
+            try:
+                self.con.execute("SET allowed_directories = $dirs", {"dirs": [os.path.join(os.path.abspath(archive_dir), "")]})
+                self.con.execute("SET allowed_paths = $paths", {"paths": [db_path, db_path + "-wal", db_path + "-shm"]})
+            except duckdb.Error as e:
+                # DuckDB < 1.2 has no allow lists, and switching external access
+                # off would block the archive too: named queries only
+                from utils.logger import logger
+
+                logger.warning(f"DuckDB {duckdb.__version__} can't restrict file access ({e}); ad-hoc SQL is disabled")
+            else:
+                self.con.execute("SET enable_external_access = false")
+                self.sandboxed = True
+            self.con.execute("SET lock_configuration = true")
+
+    def _refresh_live(self):
+        # Called with self.lock held; starts a copy in the background and returns
+        if self.refreshing is not None or time.time() - self.live_loaded_at < REFRESH_SECONDS:
+            return
+        version = _data_version(self.db_path)
+        if version == self.live_version:
+            return
+        full = time.time() - self.live_full_at >= FULL_REFRESH_SECONDS
+        self.refreshing = threading.Thread(target=self._copy_live_logged, args=(version, full), daemon=True)
+        self.refreshing.start()
+
+    def _copy_live_logged(self, version, full):
+        try:
+            self._copy_live(version, full)
+        except Exception:
+            from utils.logger import logger
+
+            logger.exception("Copying the live attacks table into DuckDB failed")
+        finally:
+            with self.lock:
+                self.live_loaded_at = time.time()  # also backs off after a failure
+                self.refreshing = None
+
+    def _copy_live(self, version, full):
+        # sqlite3 read and Arrow conversion happen without the lock; the swap
+        # or append is one statement on its own cursor
+        table = _read_live_arrow(self.db_path, 0 if full else self.live_max_id)
+        cur = self.con.cursor()
+        try:
+            cur.register("live_arrow", table)
+            if full:
+                cur.execute("CREATE OR REPLACE TABLE live_attacks AS SELECT * FROM live_arrow")
+            else:
+                cur.execute("INSERT INTO live_attacks SELECT * FROM live_arrow")
+            cur.unregister("live_arrow")
+        finally:
+            cur.close()
+        with self.lock:
+            if table.num_rows:
+                self.live_max_id = table.column("id")[-1].as_py()  # ordered by id
+            elif full:
+                self.live_max_id = 0
+            self.live_version = version
+            self.live_loaded_at = time.time()
+            if full:
+                self.live_full_at = self.live_loaded_at
+
+    def _refresh_archive(self):
+        files = sorted(glob.glob(os.path.join(self.archive_dir, "*.parquet")))
+        if files == self.archive_files:
+            return
+        if files:
+            archived = f"SELECT * FROM read_parquet({files!r}, union_by_name = true)"
+        else:
+            archived = "SELECT * FROM live_attacks WHERE false"
+        self.con.execute(f"CREATE OR REPLACE VIEW archived_attacks AS {archived}")
+        # Rows that were archived but not yet deleted from SQLite are only counted once
+        self.con.execute("""
+            CREATE OR REPLACE VIEW attacks AS
+            SELECT * FROM live_attacks
+            UNION ALL BY NAME
+            SELECT a.* FROM archived_attacks a ANTI JOIN live_attacks l ON a.id = l.id
+        """)
+        self.archive_files = files
+
+    def query(self, sql, params=None, timeout=TIMEOUT_SECONDS, max_rows=MAX_ROWS, trusted=False):
+        """Run one SELECT and return a pyarrow Table (at most max_rows rows).
+
+        SQL from outside (trusted=False, e.g. POST /api/analytics/sql) only
+        runs on a sandboxed connection.
+        """
+        if not trusted and not self.sandboxed:
+            raise QueryError("Ad-hoc SQL needs DuckDB's file sandbox (duckdb >= 1.2)")
+        statements = duckdb.extract_statements(sql)
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise QueryError("Only a single SELECT statement is allowed")
+        with self.lock:
+            if not self.scanner:
+                self._refresh_live()
+            self._refresh_archive()
+
+        cur = self.con.cursor()
+        timer = threading.Timer(timeout, cur.interrupt)
+        timer.start()
+        try:
+            table = cur.execute(f"SELECT * FROM ({sql}) LIMIT {int(max_rows)}", params or {}).fetch_arrow_table()
+        except duckdb.InterruptException:
+            raise TimeoutError(f"Query took longer than {timeout:g}s")
+        except duckdb.Error as e:
+            raise QueryError(str(e)) from None
+        finally:
+            timer.cancel()
+            cur.close()
+        return table
+
+    def named(self, name, params=None, **kwargs):
+        if name not in QUERIES:
+            raise QueryError(f"Unknown query {name!r}; available: {', '.join(QUERIES)}")
+        sql, defaults = QUERIES[name]
+        params = {**defaults, **{k: v for k, v in (params or {}).items() if k in defaults}}
+        return self.query(sql, params, trusted=True, **kwargs)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AnalyticsEngine()
+        return _engine
+
+
+def query(sql, params=None, **kwargs):
+    # Python callers and the CLI are the local user, not a request
+    return get_engine().query(sql, params, trusted=True, **kwargs)
+
+
+def archive(before, delete=False, db_path=DB_PATH, archive_dir=ARCHIVE_DIR):
+    """
+    Write attacks older than `before` to one Parquet file per month (sorted by
+    timestamp, zstd); with delete=True also remove them from SQLite (see the
+    header for what that hides). Returns rows newly archived.
+    """
+    from sqlalchemy import text
+
+    from database import SessionLocal, bump_data_version
+
+    os.makedirs(archive_dir, exist_ok=True)
+    engine = AnalyticsEngine(db_path, archive_dir, sandbox=False)
+    con = engine.con
+    params = {"before": before}
+    params["max_id"] = con.execute(
+        "SELECT max(id) FROM live_attacks WHERE timestamp < CAST($before AS TIMESTAMP)", params
+    ).fetchone()[0]
+    if params["max_id"] is None:
+        return 0
+    # Rows already archived by an earlier run (kept in SQLite) aren't written twice
+    pending = (
+        "FROM live_attacks l ANTI JOIN archived_attacks a ON l.id = a.id "
+        "WHERE l.timestamp < CAST($before AS TIMESTAMP) AND l.id <= $max_id"
+    )
+    months = con.execute(f"SELECT DISTINCT strftime(l.timestamp, '%Y-%m') {pending}", params).fetchall()
+
+    total = 0
+    for (month,) in sorted(months):
+        path = os.path.join(archive_dir, f"attacks-{month}-{int(time.time() * 1000)}.parquet")
+        select = f"SELECT l.* {pending} AND strftime(l.timestamp, '%Y-%m') = $month ORDER BY l.timestamp"
+        con.execute(
+            f"COPY ({select}) TO '{path}.tmp' (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE 122880)",
+            dict(params, month=month),
+        )
+        os.replace(f"{path}.tmp", path)
+        total += con.execute(f"SELECT count(*) FROM read_parquet('{path}')").fetchone()[0]
+    # Every row the delete below matches must now be in the archive
+    engine._refresh_archive()
+    safe = con.execute(
+        "SELECT count(*) FROM live_attacks l SEMI JOIN archived_attacks a ON l.id = a.id "
+        "WHERE l.timestamp < CAST($before AS TIMESTAMP) AND l.id <= $max_id",
+        params,
+    ).fetchone()[0]
+    con.close()
+
+    if delete:
+        session = SessionLocal()
+        try:
+            deleted = session.execute(
+                text("DELETE FROM attacks WHERE timestamp < :before AND id <= :max_id"),
+                params,
+            ).rowcount
+            if deleted != safe:
+                session.rollback()
+                raise RuntimeError(f"{safe} rows are archived but {deleted} matched for delete — kept them in SQLite")
+            bump_data_version(session)
+            session.commit()
+        finally:
+            session.close()
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embedded analytics over live and archived attacks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("archive", help="copy rows older than --before into Parquet")
+    p.add_argument("--before", required=True, help="e.g. 2025-06-01")
+    p.add_argument("--delete", action="store_true",
+                   help="remove the archived rows from SQLite (the dashboard endpoints then no longer see them)")
+    p = sub.add_parser("sql", help="run one SELECT and print the result")
+    p.add_argument("sql")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.command == "archive":
+        n = archive(args.before, delete=args.delete)
+        print(f"Archived {n} attacks to {ARCHIVE_DIR} in {time.perf_counter() - t0:.2f}s")
+    else:
+        print(query(args.sql).to_pandas().to_string())
+        print(f"({time.perf_counter() - t0:.3f}s)")
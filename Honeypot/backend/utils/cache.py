@@ -0,0 +1,187 @@
+# backend/utils/cache.py — response cache for the API
+#
+# Entries are (data_version, body bytes). An entry is only valid while the
+# data version it was built from is still current, so nothing ever has to be
+# explicitly invalidated: a write bumps the version and every older entry
+# simply stops matching.
+#
+# Backends:
+#   HONEYPOT_CACHE_URL unset            → in-process LRU only
+#   HONEYPOT_CACHE_URL=file:///some/dir → LRU + shared on-disk cache (several uvicorn workers)
+#   HONEYPOT_CACHE_URL=redis://host/0   → LRU + Redis (needs `pip install redis`)
+#
+# Shared entries are stored as raw bytes (magic + version + body), never
+# pickled, so whoever can write to the cache dir or Redis can at worst serve a
+# wrong body, not run code. The file cache is capped by age and total size:
+#   HONEYPOT_CACHE_MAX_AGE=3600        seconds an entry file is kept (same as the Redis TTL)
+#   HONEYPOT_CACHE_DIR_MAX_MB=256      oldest files are removed beyond this
+import hashlib
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+class LRUCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+_MAGIC = b"HPC1"
+_HEADER = struct.Struct("!4sq")  # magic, data_version
+
+
+def pack_entry(entry):
+    version, body = entry
+    return _HEADER.pack(_MAGIC, version) + bytes(body)
+
+
+def unpack_entry(raw):
+    if raw is None or len(raw) < _HEADER.size:
+        return None
+    magic, version = _HEADER.unpack_from(raw)
+    if magic != _MAGIC:
+        return None  # foreign or old-format entry: treat as a miss
+    return version, raw[_HEADER.size:]
+
+
+class FileCache:
+    """One file per key in a shared directory. Writes are atomic (rename).
+
+    Files older than max_age are ignored and removed; every PRUNE_EVERY writes
+    the directory is trimmed back under max_bytes, oldest first.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, max_age=3600, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime > self.max_age:
+                    raw = None
+                else:
+                    raw = f.read()
+        except FileNotFoundError:
+            return None
+        if raw is None:
+            self._unlink(path)
+        return unpack_entry(raw)
+
+    def set(self, key, entry):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pack_entry(entry))
+        os.replace(tmp, self._path(key))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Drop expired files, then the oldest ones until the directory fits in max_bytes."""
+        now = time.time()
+        files = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue  # removed by another worker
+                if now - st.st_mtime > self.max_age:
+                    self._unlink(e.path)
+                elif not e.name.startswith(".tmp-"):
+                    files.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._unlink(path)
+            total -= size
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+class RedisCache:
+    def __init__(self, url, ttl=3600):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("HONEYPOT_CACHE_URL points at Redis but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return unpack_entry(self.client.get("honeypot:" + key))
+
+    def set(self, key, entry):
+        self.client.set("honeypot:" + key, pack_entry(entry), ex=self.ttl)
+
+
+class ResponseCache:
+    """LRU in front of an optional shared backend."""
+
+    def __init__(self, maxsize=256, shared=None):
+        self.local = LRUCache(maxsize)
+        self.shared = shared
+
+    def get(self, key, version):
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def set(self, key, version, body):
+        entry = (version, body)
+        self.local.set(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry)
+
+
+def cache_from_env():
+    url = os.environ.get("HONEYPOT_CACHE_URL", "")
+    maxsize = int(os.environ.get("HONEYPOT_CACHE_SIZE", "256"))
+    max_age = int(os.environ.get("HONEYPOT_CACHE_MAX_AGE", "3600"))
+    shared = None
+    if url.startswith("file://"):
+        max_mb = float(os.environ.get("HONEYPOT_CACHE_DIR_MAX_MB", "256"))
+        shared = FileCache(urlparse(url).path, max_age, int(max_mb * 1024 * 1024))
+    elif url.startswith(("redis://", "rediss://", "unix://")):
+        shared = RedisCache(url, max_age)
+    elif url:
+        raise RuntimeError(f"Unsupported HONEYPOT_CACHE_URL: {url}")
+    return ResponseCache(maxsize, shared)
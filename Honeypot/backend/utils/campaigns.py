@@ -0,0 +1,216 @@
+# backend/utils/campaigns.py — incremental sessionization of attacks into campaigns
+#
+# A campaign is every attack from one src_ip with no gap longer than
+# CAMPAIGN_GAP between consecutive attempts; inside it, a new session starts
+# after SESSION_GAP of silence. Each run folds only the attacks rows past the
+# "campaigns" checkpoint into the campaigns table, so dashboards and ML code can
+# read per-campaign aggregates instead of grouping the whole attacks table.
+#
+# While a campaign is open its credential sets and running flow statistics
+# live in campaigns.state; once nothing has arrived for CAMPAIGN_GAP it is
+# closed and the state is dropped, leaving only the aggregate columns.
+# A row that arrives after its campaign was closed (e.g. a pcap replay of old
+# traffic loaded after live data) starts a new campaign.
+#
+# The honeypot runs this every CAMPAIGN_INTERVAL_SECONDS in a worker thread,
+# one committed batch of attacks at a time. Backfill / one-off (run from backend/):
+#   python -m utils.campaigns
+#   python -m utils.campaigns --follow 30
+import json
+import math
+import time
+from datetime import datetime, timedelta
+
+SESSION_GAP = timedelta(minutes=5)
+CAMPAIGN_GAP = timedelta(hours=1)
+CHECKPOINT_NAME = "campaigns"
+FLOW_FEATURES = (
+    "flow_duration",
+    "total_fwd_packets",
+    "total_backward_packets",
+    "total_length_fwd_packets",
+    "total_length_bwd_packets",
+    "flow_bytes_s",
+    "flow_iat_mean",
+)
+
+
+class CampaignState:
+    """In-memory side of one open campaign (row is the Campaign ORM object)."""
+
+    def __init__(self, row):
+        # Work on plain attributes; they go back onto the row in store()
+        self.row = row
+        self.start_ts, self.end_ts = row.start_ts, row.end_ts
+        self.first_id, self.last_id = row.first_attack_id, row.last_attack_id
+        self.attempts, self.sessions, self.country = row.attempts, row.sessions, row.country
+        if row.state:
+            d = json.loads(row.state)
+            self.usernames = set(d["usernames"])
+            self.passwords = set(d["passwords"])
+            self.credentials = set(d["credentials"])
+            self.flow = d["flow"]
+        else:
+            self.usernames, self.passwords, self.credentials = set(), set(), set()
+            self.flow = {f: [0, 0.0, 0.0, None, None] for f in FLOW_FEATURES}  # n, mean, M2, min, max
+
+    def covers(self, ts):
+        return self.start_ts - CAMPAIGN_GAP <= ts <= self.end_ts + CAMPAIGN_GAP
+
+    def add(self, attack):
+        ts = attack.timestamp
+        if self.attempts and ts - self.end_ts > SESSION_GAP:
+            self.sessions += 1
+        self.start_ts = min(self.start_ts, ts)
+        self.end_ts = max(self.end_ts, ts)
+        self.first_id = min(self.first_id, attack.id)
+        self.last_id = max(self.last_id, attack.id)
+        self.attempts += 1
+        if attack.country and not self.country:
+            self.country = attack.country
+
+        # Flows without a login (e.g. from pcap_replay.py) count as attempts but not as credentials
+        if attack.username:
+            self.usernames.add(attack.username)
+            self.credentials.add(f"{attack.username}\0{attack.password or ''}")
+        if attack.password:
+            self.passwords.add(attack.password)
+
+        for f in FLOW_FEATURES:
+            x = getattr(attack, f)
+            if x is None:
+                continue
+            s = self.flow[f]
+            # Welford's running mean/variance
+            s[0] += 1
+            delta = x - s[1]
+            s[1] += delta / s[0]
+            s[2] += delta * (x - s[1])
+            s[3] = x if s[3] is None else min(s[3], x)
+            s[4] = x if s[4] is None else max(s[4], x)
+
+    def store(self):
+        row = self.row
+        row.start_ts, row.end_ts = self.start_ts, self.end_ts
+        row.first_attack_id, row.last_attack_id = self.first_id, self.last_id
+        row.attempts, row.sessions, row.country = self.attempts, self.sessions, self.country
+        row.duration_s = (self.end_ts - self.start_ts).total_seconds()
+        row.unique_usernames = len(self.usernames)
+        row.unique_passwords = len(self.passwords)
+        row.unique_credentials = len(self.credentials)
+        row.flow_stats = json.dumps({
+            # Sample std, like the statistics.stdev() the honeypot uses for its flow features
+            f: {"mean": mean, "std": math.sqrt(m2 / (n - 1)) if n > 1 else 0.0, "min": lo, "max": hi}
+            for f, (n, mean, m2, lo, hi) in self.flow.items()
+        })
+        row.state = json.dumps({
+            "usernames": sorted(self.usernames),
+            "passwords": sorted(self.passwords),
+            "credentials": sorted(self.credentials),
+            "flow": self.flow,
+        }).encode()
+
+
+def _load_open(session, ips):
+    from database import Campaign
+
+    ips = list(ips)
+    open_by_ip = {}
+    for i in range(0, len(ips), 500):
+        rows = session.query(Campaign).filter(Campaign.state.isnot(None), Campaign.src_ip.in_(ips[i:i + 500])).all()
+        for row in rows:
+            open_by_ip.setdefault(row.src_ip, []).append(CampaignState(row))
+    return open_by_ip
+
+
+def _fold_batch(session, after, batch_size):
+    """Fold up to batch_size attacks past `after` into campaigns (not committed).
+    Returns (attacks folded, last id folded)."""
+    from database import Attack, Campaign
+
+    cols = [Attack.id, Attack.timestamp, Attack.src_ip, Attack.username, Attack.password, Attack.country]
+    cols += [getattr(Attack, f) for f in FLOW_FEATURES]
+    rows = session.query(*cols).filter(Attack.id > after).order_by(Attack.id).limit(batch_size).all()
+    if not rows:
+        return 0, after
+
+    open_by_ip = _load_open(session, {r.src_ip for r in rows})
+    touched = {}
+    # Time order inside the batch so replayed captures sessionize sensibly
+    for attack in sorted(rows, key=lambda r: (r.timestamp, r.id)):
+        candidates = open_by_ip.setdefault(attack.src_ip, [])
+        state = next((c for c in reversed(candidates) if c.covers(attack.timestamp)), None)  # newest first
+        if state is None:
+            row = Campaign(
+                src_ip=attack.src_ip, start_ts=attack.timestamp, end_ts=attack.timestamp,
+                first_attack_id=attack.id, last_attack_id=attack.id, attempts=0, sessions=1,
+            )
+            session.add(row)
+            state = CampaignState(row)
+            candidates.append(state)
+        state.add(attack)
+        touched[id(state)] = state
+    for state in touched.values():
+        state.store()
+    return len(rows), rows[-1].id
+
+
+def process(session_factory, batch_size=10_000, now=None):
+    """Fold attacks past the checkpoint into campaigns, then close idle ones.
+    Returns (attacks folded, campaigns closed).
+
+    Each batch (its campaign updates plus the checkpoint) commits in its own
+    transaction, so a large backfill holds at most one batch of campaign
+    state in memory and a crash loses at most the batch in progress.
+    """
+    from database import Campaign, Checkpoint, bump_data_version
+
+    folded = 0
+    while True:
+        session = session_factory()
+        try:
+            cp = session.get(Checkpoint, CHECKPOINT_NAME)
+            n, last_id = _fold_batch(session, cp.last_id if cp else 0, batch_size)
+            if not n:
+                break
+            session.merge(Checkpoint(name=CHECKPOINT_NAME, last_id=last_id))
+            bump_data_version(session)
+            session.commit()
+        finally:
+            session.close()
+        folded += n
+        if n < batch_size:
+            break
+
+    session = session_factory()
+    try:
+        cutoff = (now or datetime.utcnow()) - CAMPAIGN_GAP
+        closed = session.query(Campaign).filter(Campaign.state.isnot(None), Campaign.end_ts < cutoff).update(
+            {Campaign.state: None}, synchronize_session=False
+        )
+        if closed:
+            bump_data_version(session)
+        session.commit()
+    finally:
+        session.close()
+    return folded, closed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Fold new attacks into campaigns")
+    parser.add_argument("--follow", type=float, metavar="SECONDS", help="keep running, polling this often")
+    args = parser.parse_args()
+    init_db()
+
+    while True:
+        t0 = time.perf_counter()
+        folded, closed = process(SessionLocal)
+        if folded or closed or not args.follow:
+            print(f"Folded {folded} attacks, closed {closed} campaigns in {time.perf_counter() - t0:.2f}s")
+        if not args.follow:
+            break
+        time.sleep(args.follow)
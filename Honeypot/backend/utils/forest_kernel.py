@@ -0,0 +1,355 @@
+# backend/utils/forest_kernel.py — compiled tree-ensemble inference
+#
+# sklearn's predict on a forest validates the input, then walks the trees one
+# by one (each with its own call overhead), so scoring a single flow costs
+# milliseconds while the tree walks themselves are a few hundred comparisons.
+# This flattens a fitted RandomForestClassifier or IsolationForest into a
+# handful of contiguous NumPy arrays (all trees' nodes concatenated, leaves
+# pointing at themselves) and evaluates every tree for a whole batch at once:
+# one vectorized step per tree *level*, no Python loop over nodes or trees.
+#
+# Nodes are renumbered so every internal node comes before every leaf: leaf
+# values are stored for leaves only and "done" is a single compare. Rows are
+# walked in chunks, tree-major, so each gather stays inside one tree.
+#
+# Where it wins: the per-call overhead is gone, so one row costs ~0.2 ms
+# instead of ~6 ms (100 trees, depth 20) and batches up to a few hundred rows
+# are several times faster. At ~1k rows the two break even, and for big
+# batches sklearn's compiled per-row walk is faster than any amount of NumPy
+# gathering — so bulk scoring (classify_flows.py with full batches) should
+# stay on sklearn and small/live batches use this.
+#
+# Results match sklearn exactly — same leaves, same float64 accumulation
+# order — see check_equivalence() / `--bench`, which asserts it:
+#   RandomForestClassifier  predict_proba, predict
+#   IsolationForest         score_samples, decision_function, predict
+#
+# Usage:
+#   compiled = CompiledForest.from_sklearn(model)
+#   compiled.predict_proba(X)          # X: (n, n_features), any float dtype
+#   compiled.save(path); CompiledForest.load(path)
+# Benchmark single-row latency and rows/s at batch 1..10k against sklearn
+# (run from backend/):
+#   python -m utils.forest_kernel --bench
+import time
+
+import numpy as np
+
+CLASSIFIER = "classifier"
+ISOLATION = "isolation"
+CHUNK_ROWS = 1024  # rows walked together; keeps the (trees, rows) temporaries in cache
+_LEAF_CHECK_EVERY = 4  # levels between "all rows at a leaf yet?" checks
+
+
+def _float32_floor(t):
+    # Largest float32 <= t. sklearn compares float32 inputs against float64
+    # thresholds, and for float32 x:  x <= t  <=>  x <= floor32(t)
+    t32 = t.astype(np.float32)
+    over = t32.astype(np.float64) > t
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+def _average_path_length(n):
+    # Same as sklearn.ensemble._iforest._average_path_length
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+def _node_depths(tree):
+    # Root = 1, like Tree.compute_node_depths() (which older sklearn lacks)
+    depths = np.zeros(tree.node_count, np.int64)
+    frontier, d = np.array([0]), 1
+    while len(frontier):
+        depths[frontier] = d
+        inner = frontier[tree.children_left[frontier] != -1]
+        frontier = np.concatenate([tree.children_left[inner], tree.children_right[inner]])
+        d += 1
+    return depths
+
+
+class CompiledForest:
+    def __init__(self, kind, feature, threshold, children, missing_left, leaf_value, roots, max_depth,
+                 n_features, classes=None, offset=None, denominator=None):
+        self.kind = kind
+        # All trees' nodes, internal nodes first then leaves (see from_sklearn)
+        self.feature = feature            # int32 (nodes,) — column of X to test; 0 for leaves
+        self.threshold = threshold        # float32 (nodes,) — go right if x > threshold; +inf for leaves
+        self.children = children          # int32 (2*nodes,) — [left, right] per node; leaves point at themselves
+        self.missing_left = missing_left  # bool (nodes,) — where NaN goes (sklearn >= 1.3 trees)
+        self.leaf_value = leaf_value      # float64 (leaves, n_classes) probabilities, or (leaves,) path lengths
+        self.roots = roots                # int32 (trees,)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.classes = classes
+        self.offset = offset
+        self.denominator = denominator
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.missing_left,
+                                      self.leaf_value, self.roots))
+
+    # === Export ===
+
+    @classmethod
+    def from_sklearn(cls, model):
+        from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+        if isinstance(model, RandomForestClassifier):
+            kind = CLASSIFIER
+            if model.n_outputs_ != 1:
+                raise ValueError("Only single-output forests are supported")
+        elif isinstance(model, IsolationForest):
+            kind = ISOLATION
+        else:
+            raise TypeError(f"Can't compile {type(model).__name__}")
+
+        n_features = model.n_features_in_
+        subsample = kind == ISOLATION and model._max_features != n_features
+        trees = [est.tree_ for est in model.estimators_]
+        is_leaf = [tree.children_left == -1 for tree in trees]
+
+        # Renumber: every tree's internal nodes first (tree by tree), then every
+        # tree's leaves. Leaf values are then stored for leaves only, and
+        # "reached a leaf" is just `node >= n_internal`.
+        n_int = np.array([(~leaf).sum() for leaf in is_leaf])
+        n_leaf = np.array([leaf.sum() for leaf in is_leaf])
+        n_internal = int(n_int.sum())
+        int_start = np.concatenate([[0], np.cumsum(n_int)[:-1]])
+        leaf_start = n_internal + np.concatenate([[0], np.cumsum(n_leaf)[:-1]])
+        n_nodes = n_internal + int(n_leaf.sum())
+
+        feature = np.zeros(n_nodes, np.int32)
+        threshold = np.full(n_nodes, np.inf)
+        children = np.empty(2 * n_nodes, np.int32)
+        missing_left = np.zeros(n_nodes, bool)
+        if kind == CLASSIFIER:
+            leaf_value = np.empty((n_nodes - n_internal, len(model.classes_)))
+        else:
+            leaf_value = np.empty(n_nodes - n_internal)
+        roots = np.empty(len(trees), np.int32)
+
+        for t, (tree, leaf) in enumerate(zip(trees, is_leaf)):
+            inner, leaves = np.flatnonzero(~leaf), np.flatnonzero(leaf)
+            new = np.empty(tree.node_count, np.int64)
+            new[inner] = int_start[t] + np.arange(len(inner))
+            new[leaves] = leaf_start[t] + np.arange(len(leaves))
+            roots[t] = new[0]
+
+            f = tree.feature[inner]
+            if subsample:
+                # Isolation trees are fit on a column subset; map back to X's columns
+                f = model.estimators_features_[t][f]
+            feature[new[inner]] = f
+            threshold[new[inner]] = tree.threshold[inner]
+            children[2 * new[inner]] = new[tree.children_left[inner]]
+            children[2 * new[inner] + 1] = new[tree.children_right[inner]]
+            children[2 * new[leaves]] = children[2 * new[leaves] + 1] = new[leaves]  # leaves stay put
+            miss = getattr(tree, "missing_go_to_left", None)  # NaN routing, sklearn >= 1.3
+            if miss is not None:
+                missing_left[new[inner]] = np.asarray(miss, bool)[inner]
+
+            if kind == CLASSIFIER:
+                v = tree.value[leaves, 0, :].astype(np.float64)
+                norm = v.sum(axis=1, keepdims=True)
+                if not np.allclose(norm, 1.0):
+                    # sklearn < 1.4 stores class counts and normalizes in predict_proba;
+                    # newer versions store the fractions and return them as-is
+                    norm[norm == 0.0] = 1.0
+                    v = v / norm
+            else:
+                # As IsolationForest: depth of the leaf + expected depth of what's left in it - 1
+                v = ((_node_depths(tree) + _average_path_length(tree.n_node_samples)) - 1.0)[leaves]
+            leaf_value[new[leaves] - n_internal] = v
+
+        kwargs = {}
+        if kind == CLASSIFIER:
+            kwargs["classes"] = np.asarray(model.classes_)
+        else:
+            kwargs["offset"] = float(model.offset_)
+            kwargs["denominator"] = float(len(trees) * _average_path_length([model.max_samples_])[0])
+        return cls(kind, feature, _float32_floor(threshold), children, missing_left, leaf_value, roots,
+                   max(tree.max_depth for tree in trees), n_features, **kwargs)
+
+    # === Traversal ===
+
+    @property
+    def n_internal(self):
+        return len(self.feature) - len(self.leaf_value)
+
+    def apply(self, X):
+        """Leaf reached in every tree, (n_trees, n_rows) int32 — indices into leaf_value."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, the model expects {self.n_features}")
+        n = X.shape[0]
+        has_nan = bool(np.isnan(X).any())
+        out = np.empty((self.n_trees, n), np.int32)
+        for start in range(0, n, CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            out[:, start:start + len(chunk)] = self._walk(chunk.ravel(), len(chunk), has_nan)
+        return out - self.n_internal
+
+    def _walk(self, flat, m, has_nan):
+        # Tree-major (trees, rows): neighbouring elements walk the same tree, so
+        # the node gathers stay inside one tree's slice of the arrays
+        feature, threshold, children, n_internal = self.feature, self.threshold, self.children, self.n_internal
+        row_start = np.arange(m, dtype=np.int32) * self.n_features
+        node = np.repeat(self.roots[:, None], m, axis=1)
+        for level in range(self.max_depth):
+            x = flat[feature[node] + row_start]
+            go_right = x > threshold[node]  # NaN compares False (left) — fixed up below
+            if has_nan:
+                nan = np.isnan(x)
+                go_right[nan] = ~self.missing_left[node[nan]]
+            node = children[(node << 1) + go_right]
+            if level % _LEAF_CHECK_EVERY == _LEAF_CHECK_EVERY - 1 and (node >= n_internal).all():
+                break
+        return node
+
+    def _accumulate(self, leaves):
+        # Sum over trees in tree order, the same float64 sequence as sklearn's
+        # `out += tree_out`. cumsum is strictly sequential; .sum() may regroup
+        # the additions on big arrays and drift by an ulp.
+        values = self.leaf_value[leaves]
+        return np.cumsum(values, axis=0, out=values)[-1]
+
+    # === RandomForestClassifier ===
+
+    def predict_proba(self, X):
+        if self.kind != CLASSIFIER:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._accumulate(self.apply(X)) / self.n_trees
+
+    # === IsolationForest ===
+
+    def score_samples(self, X):
+        if self.kind != ISOLATION:
+            raise AttributeError("score_samples is only available for isolation forests")
+        depths = self._accumulate(self.apply(X))
+        if self.denominator == 0:
+            # max_samples == 1: sklearn takes depth/denominator as 1, so every row scores -2**-1
+            return -0.5 * np.ones_like(depths)
+        # Opposite of the paper's anomaly score, as sklearn: lower = more abnormal
+        return -(2 ** (-(depths / self.denominator)))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        if self.kind == CLASSIFIER:
+            return self.classes[self.predict_proba(X).argmax(axis=1)]
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    # === Persistence ===
+
+    def save(self, path):
+        extra = {"classes": self.classes} if self.kind == CLASSIFIER else {
+            "offset": np.float64(self.offset), "denominator": np.float64(self.denominator)}
+        np.savez(
+            path, kind=np.array(self.kind), feature=self.feature, threshold=self.threshold, children=self.children,
+            missing_left=self.missing_left, leaf_value=self.leaf_value, roots=self.roots,
+            max_depth=np.int64(self.max_depth), n_features=np.int64(self.n_features), **extra,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as d:
+            kind = str(d["kind"])
+            extra = {"classes": d["classes"]} if kind == CLASSIFIER else {
+                "offset": float(d["offset"]), "denominator": float(d["denominator"])}
+            return cls(kind, d["feature"], d["threshold"], d["children"], d["missing_left"], d["leaf_value"],
+                       d["roots"], int(d["max_depth"]), int(d["n_features"]), **extra)
+
+
+def check_equivalence(model, compiled, X):
+    """Assert the compiled forest reproduces the sklearn model on X bit-for-bit."""
+    if compiled.kind == CLASSIFIER:
+        np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+    else:
+        np.testing.assert_array_equal(compiled.score_samples(X), model.score_samples(X))
+        np.testing.assert_array_equal(compiled.decision_function(X), model.decision_function(X))
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+
+# === Benchmark ===
+
+def _synthetic_flows(n, n_features, seed=0):
+    # Heavy-tailed, CIC-like feature columns with a few exact zeros and a label
+    # that depends on several of them
+    rng = np.random.default_rng(seed)
+    X = rng.lognormal(mean=3.0, sigma=2.0, size=(n, n_features))
+    X[rng.random((n, n_features)) < 0.1] = 0.0
+    score = np.log1p(X[:, 1]) - np.log1p(X[:, 4]) + 0.5 * np.log1p(X[:, 12]) + rng.normal(0, 1, n)
+    y = np.where(score > 2.5, "BruteForce", np.where(score < -1.5, "PortScan", "BENIGN"))
+    return X, y
+
+
+def _time_per_call(fn, X, min_seconds=0.3, max_calls=2000):
+    fn(X)  # warm up
+    calls, t0 = 0, time.perf_counter()
+    while calls < max_calls and (calls < 3 or time.perf_counter() - t0 < min_seconds):
+        fn(X)
+        calls += 1
+    return (time.perf_counter() - t0) / calls
+
+
+def bench(n_estimators=100, max_depth=20, n_features=35, train_rows=50_000,
+          batch_sizes=(1, 10, 100, 1000, 10_000)):
+    from sklearn.ensemble import IsolationForest, RandomForestClassifier
+
+    X, y = _synthetic_flows(train_rows, n_features)
+    X_test, _ = _synthetic_flows(max(batch_sizes), n_features, seed=1)
+    X_nan = X_test[:2000].copy()
+    X_nan[np.random.default_rng(2).random(X_nan.shape) < 0.02] = np.nan
+
+    models = [
+        ("RandomForestClassifier", RandomForestClassifier(
+            n_estimators=n_estimators, max_depth=max_depth, class_weight="balanced", random_state=42, n_jobs=1
+        ).fit(X, y), "predict_proba"),
+        ("IsolationForest", IsolationForest(
+            n_estimators=n_estimators, contamination=0.05, random_state=42, n_jobs=1
+        ).fit(X), "score_samples"),
+    ]
+    for name, model, method in models:
+        t0 = time.perf_counter()
+        compiled = CompiledForest.from_sklearn(model)
+        export_ms = (time.perf_counter() - t0) * 1000
+        check_equivalence(model, compiled, X_test)
+        checked = f"{len(X_test):,} rows"
+        try:
+            check_equivalence(model, compiled, X_nan)
+            checked += f" + {len(X_nan):,} with NaNs"
+        except ValueError:
+            pass  # this sklearn version rejects NaN for the model
+        print(f"\n{name}: {compiled.n_trees} trees, {len(compiled.feature):,} nodes, depth {compiled.max_depth}, "
+              f"{compiled.nbytes / 1e6:.1f} MB, compiled in {export_ms:.0f} ms — identical to sklearn on {checked}")
+        print(f"  {'batch':>6}  {'sklearn':>12}  {'compiled':>12}  {'sklearn rows/s':>15}  {'compiled rows/s':>15}  speedup")
+        for b in batch_sizes:
+            batch = X_test[:b]
+            t_sk = _time_per_call(getattr(model, method), batch)
+            t_c = _time_per_call(getattr(compiled, method), batch)
+            print(f"  {b:>6}  {t_sk * 1e6:>10.0f}µs  {t_c * 1e6:>10.0f}µs  {b / t_sk:>15,.0f}  {b / t_c:>15,.0f}  {t_sk / t_c:6.1f}x")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compiled forest inference: equivalence check and benchmark")
+    parser.add_argument("--bench", action="store_true", required=True)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=20)
+    parser.add_argument("--train-rows", type=int, default=50_000)
+    args = parser.parse_args()
+    bench(args.trees, args.max_depth, train_rows=args.train_rows)
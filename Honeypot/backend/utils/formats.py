@@ -0,0 +1,273 @@
+# backend/utils/formats.py — response encodings for bulk consumers
+#
+# Pick a format with ?format=<name> or an Accept header:
+#   json     application/json                     (orjson when installed)
+#   msgpack  application/msgpack                  one column-oriented map per batch
+#   arrow    application/vnd.apache.arrow.stream  Arrow IPC stream (needs pyarrow)
+#   parquet  application/vnd.apache.parquet       one row group per batch (needs pyarrow)
+#   csv      text/csv
+#
+# Everything works on plain row tuples plus the table's columns, so no
+# per-row ORM object or dict is built; JSON objects are filled in from a
+# per-batch key template (see _json_objects).
+import csv
+import io
+import json
+from datetime import date, datetime
+from itertools import chain
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+
+_ACCEPT_ALIASES = {
+    "application/x-msgpack": "msgpack",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/x-parquet": "parquet",
+}
+
+
+def negotiate(request, allowed, default):
+    """Return the format to use, or None if ?format= names one we can't give.
+    An Accept header we don't understand just gets the default."""
+    fmt = request.query_params.get("format")
+    if fmt:
+        return fmt if fmt in allowed else None
+
+    for part in request.headers.get("accept", "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in ("", "*/*"):
+            return default
+        name = _ACCEPT_ALIASES.get(media) or next((k for k, v in MEDIA_TYPES.items() if v == media), None)
+        if name in allowed:
+            return name
+    return default
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def dumps_json(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+# === Per-format batch encoders: (names, rows) -> bytes ===
+
+def _json_column(values):
+    """JSON fragment (bytes) for every value of one column."""
+    if not values:
+        return []
+    # One call for the whole column, split back into values. That is only
+    # right if no value's JSON contains a comma (numbers, dates, most strings);
+    # otherwise the split comes out too long and we encode value by value.
+    frags = dumps_json(values)[1:-1].split(b",")
+    if len(frags) == len(values):
+        return frags
+    memo = {}  # repeated strings (usernames, countries...) are encoded once
+    out = []
+    for v in values:
+        if type(v) is not str:
+            out.append(dumps_json(v))
+            continue
+        frag = memo.get(v)
+        if frag is None:
+            frag = memo[v] = dumps_json(v)
+        out.append(frag)
+    return out
+
+
+def _object_template(names):
+    # b'{"id":%b,"src_ip":%b,...}' — the keys are encoded once per batch
+    keys = [dumps_json(n).replace(b"%", b"%%") + b":%b" for n in names]
+    return b"{" + b",".join(keys) + b"}"
+
+
+def _json_objects(names, rows):
+    # Body of a JSON array of objects (no brackets) so batches can be
+    # concatenated. No per-row dicts: the values are encoded in bulk and the
+    # keys come from a template.
+    if not rows:
+        return b""
+    if not names:
+        return b",".join([b"{}"] * len(rows))
+    n, k = len(rows), len(names)
+    if type(rows[0]) is not tuple:
+        rows = [tuple(r) for r in rows]  # SQLAlchemy Rows aren't JSON-serializable
+    # Fast path: the whole batch as nested arrays in one encoder call. If it
+    # has exactly the separator commas, no value contains one, so splitting
+    # on commas gives the values back in row order.
+    body = dumps_json(rows)[2:-2]
+    if body.count(b",") == n * k - 1:
+        values = body.replace(b"],[", b",").split(b",")
+    else:
+        # Some string has a comma: encode column by column and interleave
+        cols = [_json_column(list(c)) for c in zip(*rows)]
+        values = list(chain.from_iterable(zip(*cols)))
+    return b",".join([_object_template(names)] * n) % tuple(values)
+
+
+def _msgpack_batch(names, rows):
+    import msgpack
+
+    cols = list(zip(*rows)) if rows else [()] * len(names)
+    return msgpack.packb({n: list(c) for n, c in zip(names, cols)}, default=_default)
+
+
+def _csv_batch(names, rows, header=False):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(names)
+    writer.writerows(rows)
+    return out.getvalue().encode("utf-8")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Arrow/Parquet output needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def arrow_schema(columns):
+    pa = _require_pyarrow()
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp("us")}
+    return pa.schema([(c.name, types.get(c.type.python_type, pa.string())) for c in columns])
+
+
+def _record_batch(schema, rows):
+    pa = _require_pyarrow()
+    cols = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain.
+    tell() keeps counting so the Parquet footer offsets stay right."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# === Public entry points ===
+
+def encode_rows(fmt, columns, rows):
+    """Encode one complete result set in memory."""
+    names = [c.name for c in columns]
+    if fmt == "json":
+        return b"[" + _json_objects(names, rows) + b"]"
+    if fmt == "msgpack":
+        return _msgpack_batch(names, rows)
+    if fmt == "csv":
+        return _csv_batch(names, rows, header=True)
+    sink, write, close = _arrow_writer(fmt, columns)
+    write(rows)
+    close()
+    return sink.drain()
+
+
+def encode_table(fmt, table):
+    """Encode a pyarrow Table (e.g. an analytics result) without going through row tuples."""
+    pa = _require_pyarrow()
+    if fmt == "json":
+        return b"[" + _json_objects(table.column_names, list(zip(*(c.to_pylist() for c in table.columns)))) + b"]"
+    if fmt == "msgpack":
+        import msgpack
+
+        return msgpack.packb(table.to_pydict(), default=_default)
+    sink = pa.BufferOutputStream()
+    if fmt == "csv":
+        import pyarrow.csv
+
+        pyarrow.csv.write_csv(table, sink)
+    elif fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+async def stream_rows(fmt, columns, batches):
+    """Encode an async iterator of row batches as they arrive."""
+    names = [c.name for c in columns]
+    if fmt in ("arrow", "parquet"):
+        sink, write, close = _arrow_writer(fmt, columns)
+        async for rows in batches:
+            write(rows)
+            yield sink.drain()
+        close()
+        yield sink.drain()
+        return
+
+    first = True
+    if fmt == "json":
+        yield b"["
+    async for rows in batches:
+        if not rows:
+            continue
+        if fmt == "json":
+            yield (b"" if first else b",") + _json_objects(names, rows)
+        elif fmt == "msgpack":
+            yield _msgpack_batch(names, rows)
+        else:
+            yield _csv_batch(names, rows, header=first)
+        first = False
+    if fmt == "json":
+        yield b"]"
+    elif fmt == "csv" and first:
+        yield _csv_batch(names, [], header=True)
+
+
+def _arrow_writer(fmt, columns):
+    pa = _require_pyarrow()
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write(rows):
+        writer.write_batch(_record_batch(schema, rows))
+
+    return sink, write, writer.close
+
@@ -0,0 +1,244 @@
+# backend/utils/offenders.py — repeat-offender index for connect-time lookups
+#
+# A Bloom filter answers "have we seen this IP before" and a Count-Min sketch
+# (conservative update) answers "how many attacks so far", both in constant
+# time and in a fixed amount of memory no matter how many IPs show up:
+#
+#   HONEYPOT_OFFENDER_MEMORY_MB   total budget, default 64 (1/4 Bloom, 3/4 counters)
+#   HONEYPOT_OFFENDER_CAPACITY    distinct IPs to size the Bloom hashes for, default 10M
+#
+# With the defaults 10M IPs give ~0.2% false "seen" answers. Counts never
+# under-estimate; the over-estimate is small for anything but a flood.
+# stats() reports the estimated number of IPs and the current false-positive
+# rate so you can tell when the budget needs raising.
+#
+# The honeypot add()s each attack it logs right away, so the next connection
+# from that IP already sees it. Everything else (pcap_replay.py, a collector,
+# rows from before a crash) is folded in from the DB by catch_up(), which the
+# honeypot runs periodically: last_id only advances through catch_up(), and
+# live adds it finds in the DB are subtracted so no attack is counted twice.
+#
+# The index is saved to a snapshot file (with last_id and the live adds not
+# yet folded) and on startup only rows after that are read from the DB.
+# Rebuild from scratch (run from backend/):
+#   python -m utils.offenders --rebuild
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEMORY_MB = float(os.environ.get("HONEYPOT_OFFENDER_MEMORY_MB", "64"))
+CAPACITY = int(os.environ.get("HONEYPOT_OFFENDER_CAPACITY", "10000000"))
+SNAPSHOT_PATH = os.environ.get("HONEYPOT_OFFENDER_SNAPSHOT", os.path.join(BASE_DIR, "offenders.snapshot.npz"))
+CMS_DEPTH = 4
+MASK64 = (1 << 64) - 1
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+
+def ip_key(ip):
+    return int.from_bytes(hashlib.blake2b(ip.encode(), digest_size=8).digest(), "little")
+
+
+def _mix(x):
+    # splitmix64 finalizer — gives the second hash for double hashing
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+    return (x ^ (x >> 31)) | 1
+
+
+def _mix_np(x):
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return (x ^ (x >> np.uint64(31))) | np.uint64(1)
+
+
+class OffenderIndex:
+    def __init__(self, memory_mb=MEMORY_MB, capacity=CAPACITY):
+        budget = int(memory_mb * 1024 * 1024)
+        self.bloom_bits = max(64, (budget // 4) * 8)
+        self.bloom_k = max(1, min(16, round(self.bloom_bits / max(capacity, 1) * math.log(2))))
+        self.cms_width = max(64, (budget * 3 // 4) // (4 * CMS_DEPTH))
+        self._set_arrays(np.zeros((self.bloom_bits + 7) // 8, np.uint8), np.zeros((CMS_DEPTH, self.cms_width), np.uint32))
+        self.lock = threading.Lock()  # add() on the reactor thread vs catch_up()/save() in a worker
+        self.save_lock = threading.Lock()  # the periodic save vs the one at shutdown (same tmp file)
+        self.last_id = 0   # every attack up to here has been folded in from the DB
+        self.fold_to = 0   # a running/failed catch_up() owns the ids up to here
+        self.pending = {}  # attack_id -> ip for live adds not yet matched against the DB
+
+    def _set_arrays(self, bloom, cms):
+        self.bloom = bloom
+        self.cms = cms
+        # memoryviews over the same buffers: single-item access is several times faster than numpy indexing
+        self._bits = memoryview(bloom)
+        self._rows = [memoryview(row) for row in cms]
+
+    # --- single IP (connection path) ---
+
+    def _positions(self, ip):
+        h1 = ip_key(ip)
+        h2 = _mix(h1)
+        bloom = [((h1 + i * h2) & MASK64) % self.bloom_bits for i in range(self.bloom_k)]
+        cms = [((h1 + (self.bloom_k + r) * h2) & MASK64) % self.cms_width for r in range(CMS_DEPTH)]
+        return bloom, cms
+
+    def seen(self, ip):
+        bloom, _ = self._positions(ip)
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in bloom)
+
+    def hits(self, ip):
+        """Attacks recorded for this IP so far (0 if never seen)."""
+        bloom, cms = self._positions(ip)
+        bits = self._bits
+        if not all(bits[p >> 3] & (1 << (p & 7)) for p in bloom):
+            return 0
+        return min(row[p] for row, p in zip(self._rows, cms))
+
+    def add(self, ip, attack_id=None):
+        with self.lock:
+            if attack_id is not None:
+                if attack_id <= max(self.last_id, self.fold_to):
+                    return  # catch_up() counts (or already counted) this row
+                self.pending[attack_id] = ip
+            self._add(ip)
+
+    def _add(self, ip):
+        bloom, cms = self._positions(ip)
+        bits = self._bits
+        for p in bloom:
+            bits[p >> 3] |= 1 << (p & 7)
+        # Conservative update: only raise the counters that are at the minimum
+        new = min(row[p] for row, p in zip(self._rows, cms)) + 1
+        for row, p in zip(self._rows, cms):
+            if row[p] < new:
+                row[p] = new
+
+    # --- bulk (startup / rebuild) ---
+
+    def add_counts(self, ips, counts):
+        if not len(ips):
+            return
+        h1 = np.fromiter((ip_key(ip) for ip in ips), np.uint64, len(ips))
+        h2 = _mix_np(h1)
+        counts = np.asarray(counts, np.uint32)
+        for i in range(self.bloom_k):
+            pos = (h1 + np.uint64(i) * h2) % np.uint64(self.bloom_bits)
+            np.bitwise_or.at(self.bloom, pos >> np.uint64(3), (np.uint8(1) << (pos & np.uint64(7)).astype(np.uint8)))
+        for r in range(CMS_DEPTH):
+            pos = (h1 + np.uint64(self.bloom_k + r) * h2) % np.uint64(self.cms_width)
+            np.add.at(self.cms[r], pos, counts)
+
+    def catch_up(self, session_factory, batch_ids=500_000):
+        """Fold in attacks newer than last_id. Returns how many attacks were added.
+
+        Works through the id range in chunks; each chunk is read from the DB
+        outside the lock, then applied and committed to last_id in one step,
+        so a failure part-way just leaves the rest for the next call.
+        """
+        from sqlalchemy import func, select
+        from database import Attack
+
+        added = 0
+        session = session_factory()
+        try:
+            hi = session.execute(select(func.max(Attack.id))).scalar() or 0
+            with self.lock:
+                if hi <= self.last_id:
+                    return 0
+                # Rows up to hi are already committed, so this fold will see
+                # them; live add()s for them from now on are skipped
+                self.fold_to = max(self.fold_to, hi)
+                lo = self.last_id
+            while lo < hi:
+                top = min(hi, lo + batch_ids)
+                rows = session.execute(
+                    select(Attack.src_ip, func.count())
+                    .where(Attack.id > lo, Attack.id <= top, Attack.src_ip.isnot(None))
+                    .group_by(Attack.src_ip)
+                ).all()
+                with self.lock:
+                    # Attacks in this range that add() already counted
+                    live = Counter(ip for i, ip in self.pending.items() if lo < i <= top)
+                    self.pending = {i: ip for i, ip in self.pending.items() if not lo < i <= top}
+                    ips, counts = [], []
+                    for ip, n in rows:
+                        n -= live.get(ip, 0)
+                        if n > 0:
+                            ips.append(ip)
+                            counts.append(n)
+                    self.add_counts(ips, counts)
+                    self.last_id = top
+                added += sum(counts)
+                lo = top
+        finally:
+            session.close()
+        return added
+
+    # --- snapshot ---
+
+    def _meta(self):
+        return {"bloom_bits": self.bloom_bits, "bloom_k": self.bloom_k, "cms_width": self.cms_width, "cms_depth": CMS_DEPTH}
+
+    def save(self, path=SNAPSHOT_PATH):
+        with self.save_lock:
+            self._save(path)
+
+    def _save(self, path):
+        with self.lock:
+            # Copy under the lock, write outside it (add() keeps running)
+            bloom, cms = self.bloom.copy(), self.cms.copy()
+            pending = {str(i): ip for i, ip in self.pending.items() if i > self.last_id}
+            meta = dict(self._meta(), last_id=self.last_id, pending=pending)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, bloom=bloom, cms=cms, meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_PATH, memory_mb=MEMORY_MB, capacity=CAPACITY):
+        """Snapshot if it exists and matches the configured size, else an empty index."""
+        index = cls(memory_mb, capacity)
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                if {k: meta[k] for k in index._meta()} == index._meta():
+                    index._set_arrays(data["bloom"].copy(), data["cms"].copy())
+                    index.last_id = meta["last_id"]
+                    index.pending = {int(i): ip for i, ip in meta.get("pending", {}).items()}
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+        return index
+
+    def stats(self):
+        set_bits = int(_POPCOUNT[self.bloom].sum(dtype=np.int64))
+        fill = set_bits / self.bloom_bits
+        est = -self.bloom_bits / self.bloom_k * math.log(1 - fill) if fill < 1 else float("inf")
+        return {
+            "memory_mb": (self.bloom.nbytes + self.cms.nbytes) / (1024 * 1024),
+            "estimated_ips": round(est),
+            "false_positive_rate": fill ** self.bloom_k,
+            "last_id": self.last_id,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Build the repeat-offender snapshot from the attacks table")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the existing snapshot")
+    args = parser.parse_args()
+    init_db()
+
+    t0 = time.perf_counter()
+    index = OffenderIndex() if args.rebuild else OffenderIndex.load()
+    added = index.catch_up(SessionLocal)
+    index.save()
+    print(f"Added {added} attacks in {time.perf_counter() - t0:.2f}s → {SNAPSHOT_PATH}")
+    print(index.stats())
@@ -0,0 +1,159 @@
+# backend/utils/shipper.py — sensor side of fleet ingestion (see collector.py)
+#
+# Set HONEYPOT_COLLECTOR_URL (e.g. http://collector:8100) and honeypot.py
+# runs as a sensor: it keeps writing to its local database.db as usual, and
+# this ships every row past the "shipper" checkpoint to the collector.
+#
+# The local database is the spool. Rows are sent in order, BATCH_ROWS at a
+# time, as one gzip'd msgpack column batch per POST; the checkpoint only
+# moves once the collector acknowledges the batch. If the collector is down
+# nothing is lost — the next attempt resends from the checkpoint — and the
+# collector drops anything it already has, so delivery is exactly-once.
+#
+# A batch the collector rejects (400/413/415/422) would block everything
+# behind it if it were simply retried. Instead the batch is halved until the
+# offending row is isolated; that row is written to QUARANTINE_DIR
+# (HONEYPOT_SHIPPER_QUARANTINE, default backend/quarantine/) as a
+# .msgpack.gz file named after its id, logged, and skipped. Any other HTTP
+# error or a network failure is treated as "collector unavailable": retry later.
+#
+# Ship (or replay) by hand from backend/:
+#   HONEYPOT_COLLECTOR_URL=http://localhost:8100 python -m utils.shipper
+import gzip
+import json
+import os
+import socket
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTOR_URL = os.environ.get("HONEYPOT_COLLECTOR_URL", "")
+QUARANTINE_DIR = os.environ.get("HONEYPOT_SHIPPER_QUARANTINE", os.path.join(BASE_DIR, "quarantine"))
+SENSOR_ID = os.environ.get("HONEYPOT_SENSOR_ID", socket.gethostname())
+CHECKPOINT_NAME = "shipper"
+BATCH_ROWS = 5000
+TIMEOUT_SECONDS = 10
+REJECTED_STATUS = {400, 413, 415, 422}  # the batch itself is bad, not the collector
+
+
+class Shipper:
+    def __init__(self, session_factory, collector_url=COLLECTOR_URL, sensor_id=SENSOR_ID, batch_rows=BATCH_ROWS):
+        self.session_factory = session_factory
+        self.collector_url = collector_url.rstrip("/")
+        self.sensor_id = sensor_id
+        self.batch_rows = batch_rows
+        self.shipped = 0
+        self.failures = 0
+        self.quarantined = 0
+
+    def _checkpoint(self, session):
+        from database import Checkpoint
+
+        cp = session.get(Checkpoint, CHECKPOINT_NAME)
+        return cp.last_id if cp else 0
+
+    def _post(self, body, first_id, last_id):
+        req = urllib.request.Request(
+            f"{self.collector_url}/ingest",
+            data=body,
+            method="POST",
+            headers={
+                "Content-Type": "application/msgpack",
+                "Content-Encoding": "gzip",
+                "X-Sensor-Id": self.sensor_id,
+                "X-Batch-Range": f"{first_id}-{last_id}",
+            },
+        )
+        with urllib.request.urlopen(req, timeout=TIMEOUT_SECONDS) as resp:
+            return json.loads(resp.read())
+
+    def _quarantine(self, row_id, body, error):
+        from utils.logger import logger
+
+        os.makedirs(QUARANTINE_DIR, exist_ok=True)
+        path = os.path.join(QUARANTINE_DIR, f"{self.sensor_id}-{row_id}.msgpack.gz")
+        with open(path, "wb") as f:
+            f.write(body)
+        self.quarantined += 1
+        logger.error(f"Collector rejected attack {row_id} ({error}); skipped, saved to {path}")
+
+    def ship_pending(self):
+        """Send everything past the checkpoint. Returns rows acknowledged; stops at the first failure."""
+        from sqlalchemy import select
+        from database import Attack, Checkpoint
+        from utils.formats import encode_rows
+
+        table = Attack.__table__
+        columns = [c for c in table.columns if c.name != "sensor_id"]
+        sent = 0
+        limit = self.batch_rows  # shrinks while isolating a rejected row
+        session = self.session_factory()
+        try:
+            after = self._checkpoint(session)
+            while True:
+                rows = session.execute(
+                    select(*columns).where(table.c.id > after).order_by(table.c.id).limit(limit)
+                ).all()
+                if not rows:
+                    break
+                body = gzip.compress(encode_rows("msgpack", columns, rows), compresslevel=5)
+                try:
+                    ack = self._post(body, rows[0].id, rows[-1].id)
+                except urllib.error.HTTPError as e:
+                    if e.code not in REJECTED_STATUS:
+                        self._unavailable(e, len(rows))
+                        break
+                    self.failures = 0
+                    if len(rows) > 1:
+                        limit = max(1, len(rows) // 2)  # retry the first half of the batch
+                        continue
+                    self._quarantine(rows[0].id, body, e)
+                    ack = {"acked": rows[0].id}
+                except (urllib.error.URLError, OSError, ValueError) as e:
+                    self._unavailable(e, len(rows))
+                    break
+                else:
+                    self.failures = 0
+                    sent += len(rows)
+                after = max(after, ack["acked"])
+                session.merge(Checkpoint(name=CHECKPOINT_NAME, last_id=after))
+                session.commit()
+                if len(rows) < limit:
+                    break
+                limit = min(self.batch_rows, limit * 2)  # grow back after isolating a bad row
+        finally:
+            session.close()
+        self.shipped += sent
+        return sent
+
+    def _unavailable(self, error, n_rows):
+        self.failures += 1
+        if self.failures == 1 or self.failures % 30 == 0:
+            from utils.logger import logger
+
+            logger.warning(f"Collector unreachable ({error}); {n_rows}+ rows spooled locally")
+
+    def backlog(self):
+        """Rows recorded locally but not yet acknowledged by the collector."""
+        from sqlalchemy import func, select
+        from database import Attack
+
+        session = self.session_factory()
+        try:
+            after = self._checkpoint(session)
+            return session.execute(select(func.count()).where(Attack.id > after)).scalar()
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    if not COLLECTOR_URL:
+        raise SystemExit("Set HONEYPOT_COLLECTOR_URL")
+    init_db()
+    shipper = Shipper(SessionLocal)
+    t0 = time.perf_counter()
+    n = shipper.ship_pending()
+    print(f"Shipped {n} rows in {time.perf_counter() - t0:.2f}s; {shipper.backlog()} still spooled")
@@ -0,0 +1,329 @@
+# backend/utils/sketches.py — mergeable sketches for unique-IP and top-K queries
+#
+# The honeypot keeps one set of sketches per UTC day plus an all-time set and
+# flushes them to the sketch_buckets table. A window query just merges the
+# day buckets it covers, so cost depends on the number of days, not rows.
+#
+# Error bounds:
+#   HyperLogLog (p=14, 16 KiB per bucket): standard error 1.04/sqrt(2^14) ≈ 0.81%,
+#     i.e. ~95% of estimates land within ±1.6% of the true distinct count.
+#   Space-Saving (capacity 1000): every reported count c with error e satisfies
+#     c - e <= true count <= c, and e <= N/1000 per bucket (N = attacks in
+#     the bucket). Merged windows add up the per-bucket bounds. Any value that
+#     occurs more than N/1000 times is guaranteed to be tracked.
+#
+# Backfill / catch up from the attacks table (run from backend/):
+#   python -m utils.sketches
+import hashlib
+import heapq
+import json
+import math
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+HLL_PRECISION = 14
+TOPK_CAPACITY = 1000
+TOPK_FIELDS = ("src_ip", "username", "password", "country")
+CHECKPOINT_NAME = "sketches"
+ALL_TIME = "all"
+
+
+class HyperLogLog:
+    def __init__(self, p=HLL_PRECISION, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        merged = np.maximum(np.frombuffer(self.registers, np.uint8), np.frombuffer(other.registers, np.uint8))
+        self.registers = bytearray(merged.tobytes())
+        return self
+
+    def estimate(self):
+        regs = np.frombuffer(self.registers, np.uint8)
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / float(np.sum(np.exp2(-regs.astype(np.float64))))
+        zeros = int(np.count_nonzero(regs == 0))
+        if raw <= 2.5 * self.m and zeros:
+            return round(self.m * math.log(self.m / zeros))  # linear counting for small sets
+        return round(raw)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def to_bytes(self):
+        return bytes([self.p]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data[0], data[1:])
+
+
+class SpaceSaving:
+    """Heavy hitters with at most `capacity` counters (Metwally et al.)."""
+
+    def __init__(self, capacity=TOPK_CAPACITY, counts=None, total=0):
+        self.capacity = capacity
+        self.counts = counts or {}  # value -> [count, max overestimate]
+        self.total = total
+        self._heap = None  # (count, value) per tracked value; counts only grow, so entries may be stale-low
+
+    def _pop_min(self):
+        # Lazy min-heap: a stale entry is pushed back with its current count,
+        # so eviction is O(log capacity) amortized instead of scanning every counter
+        if self._heap is None:
+            self._heap = [(c, v) for v, (c, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+        while True:
+            count, value = heapq.heappop(self._heap)
+            current = self.counts[value][0]
+            if current == count:
+                return value
+            heapq.heappush(self._heap, (current, value))
+
+    def add(self, value, n=1):
+        self.total += n
+        entry = self.counts.get(value)
+        if entry is not None:
+            entry[0] += n
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[value] = [n, 0]
+            floor = 0
+        else:
+            floor = self.counts.pop(self._pop_min())[0]
+            self.counts[value] = [floor + n, floor]
+        if self._heap is not None:
+            heapq.heappush(self._heap, (floor + n, value))
+
+    def _floor(self):
+        # Anything not tracked by a full summary occurred at most min-count times
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(c for c, _ in self.counts.values())
+
+    def merge(self, other):
+        f1, f2 = self._floor(), other._floor()
+        merged = {}
+        for value in self.counts.keys() | other.counts.keys():
+            c1, e1 = self.counts.get(value, (f1, f1))
+            c2, e2 = other.counts.get(value, (f2, f2))
+            merged[value] = [c1 + c2, e1 + e2]
+        keep = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[: self.capacity]
+        self.counts = {k: v for k, v in keep}
+        self.total += other.total
+        self._heap = None
+        return self
+
+    def top(self, k):
+        items = sorted(self.counts.items(), key=lambda kv: kv[1][0], reverse=True)[:k]
+        return [{"value": v, "count": c, "error": e} for v, (c, e) in items]
+
+    def to_bytes(self):
+        return json.dumps({"capacity": self.capacity, "total": self.total, "counts": self.counts}).encode()
+
+    @classmethod
+    def from_bytes(cls, data):
+        d = json.loads(data)
+        return cls(d["capacity"], d["counts"], d["total"])
+
+
+def new_bucket():
+    bucket = {"src_ip_hll": HyperLogLog()}
+    bucket.update({field: SpaceSaving() for field in TOPK_FIELDS})
+    return bucket
+
+
+def load_bucket(blobs):
+    """blobs: {kind: bytes} for one day → bucket dict (missing kinds start empty)."""
+    bucket = new_bucket()
+    for kind, data in blobs.items():
+        if kind == "src_ip_hll":
+            bucket[kind] = HyperLogLog.from_bytes(data)
+        elif kind in TOPK_FIELDS:
+            bucket[kind] = SpaceSaving.from_bytes(data)
+    return bucket
+
+
+def merge_buckets(buckets):
+    merged = new_bucket()
+    for bucket in buckets:
+        for kind, sketch in bucket.items():
+            merged[kind].merge(sketch)
+    return merged
+
+
+def window_days(days, now=None):
+    """UTC day keys covering the last `days` days (today included)."""
+    today = (now or datetime.utcnow()).date()
+    return [str(today - timedelta(days=i)) for i in range(days)]
+
+
+class SketchStore:
+    """
+    Writer-side sketches. Lives in the honeypot process, which feeds it every
+    attack it logs. Each flush also folds in rows past the checkpoint that
+    didn't come through add() — written before a crash, or by another writer
+    such as pcap_replay.py — so every row is counted exactly once.
+
+    The checkpoint only advances to the last id a flush has read from the DB,
+    never to an id that just came through add(): a row another writer commits
+    with a lower id is still picked up. Live ids above the checkpoint are
+    remembered in seen_ids so the scan doesn't count them again.
+
+    add() runs on the reactor thread and flush() in a worker thread, so the
+    in-memory state is guarded by a lock; DB reads and writes (including
+    loading a day's bucket) happen outside it. flush_lock keeps two flushes
+    (the periodic one and the one at shutdown) from overlapping.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.buckets = {}
+        self.dirty = set()
+        self.flushed_id = 0    # checkpoint as stored in the DB
+        self.seen_ids = set()  # counted and above the checkpoint, via add() or a fold
+
+    def _load_buckets(self, days):
+        """Buckets for the days not in memory yet, read from the DB. Call without the lock."""
+        missing = [day for day in days if day not in self.buckets]
+        if not missing:
+            return {}
+        from database import SketchBucket
+
+        blobs = {day: {} for day in missing}
+        session = self.session_factory()
+        try:
+            for r in session.query(SketchBucket).filter(SketchBucket.day.in_(missing)).all():
+                blobs[r.day][r.kind] = r.data
+        finally:
+            session.close()
+        return {day: load_bucket(b) for day, b in blobs.items()}
+
+    def _install(self, loaded):
+        # With the lock held. A bucket someone else installed meanwhile wins.
+        for day, bucket in loaded.items():
+            self.buckets.setdefault(day, bucket)
+
+    def add(self, attack_id, timestamp, src_ip, username, password, country):
+        days = (str(timestamp.date()), ALL_TIME)
+        while True:
+            loaded = self._load_buckets(days)
+            with self.lock:
+                self._install(loaded)
+                # A flush may have dropped an old day's bucket since; load it again
+                if all(day in self.buckets for day in days):
+                    self._add(attack_id, timestamp, src_ip, username, password, country)
+                    return
+
+    def _add(self, attack_id, timestamp, src_ip, username, password, country):
+        # A flush may fold a row between its commit and the honeypot's add()
+        # for it: whichever comes second is skipped
+        if attack_id in self.seen_ids or attack_id <= self.flushed_id:
+            return False
+        values = {"src_ip": src_ip, "username": username, "password": password, "country": country}
+        for day in (str(timestamp.date()), ALL_TIME):
+            bucket = self.buckets[day]
+            if src_ip:
+                bucket["src_ip_hll"].add(src_ip)
+            for field, value in values.items():
+                if value:
+                    bucket[field].add(value)
+            self.dirty.add(day)
+        self.seen_ids.add(attack_id)
+        return True
+
+    def catch_up(self):
+        """Resume from the stored checkpoint. Returns how many rows were folded in."""
+        from database import Checkpoint
+
+        session = self.session_factory()
+        try:
+            cp = session.get(Checkpoint, CHECKPOINT_NAME)
+            with self.lock:
+                self.flushed_id = cp.last_id if cp else 0
+        finally:
+            session.close()
+        return self.flush()
+
+    def flush(self, batch_size=10_000):
+        with self.flush_lock:
+            return self._flush(batch_size)
+
+    def _flush(self, batch_size):
+        from database import Attack, Checkpoint, SketchBucket, bump_data_version
+
+        folded = 0
+        session = self.session_factory()
+        try:
+            after = self.flushed_id
+            while True:
+                rows = (
+                    session.query(Attack.id, Attack.timestamp, Attack.src_ip, Attack.username, Attack.password, Attack.country)
+                    .filter(Attack.id > after)
+                    .order_by(Attack.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                loaded = self._load_buckets({str(r.timestamp.date()) for r in rows} | {ALL_TIME} if rows else ())
+                with self.lock:
+                    self._install(loaded)
+                    folded += sum(self._add(*row) for row in rows)
+                if rows:
+                    after = rows[-1].id
+                if len(rows) < batch_size:
+                    break
+
+            with self.lock:
+                checkpoint = after  # everything up to here has been read from the DB
+                if not self.dirty and checkpoint == self.flushed_id:
+                    return folded
+                blobs = [(day, kind, sketch.to_bytes()) for day in self.dirty for kind, sketch in self.buckets[day].items()]
+                dirty, self.dirty = self.dirty, set()
+            try:
+                for day, kind, data in blobs:
+                    session.merge(SketchBucket(day=day, kind=kind, data=data))
+                session.merge(Checkpoint(name=CHECKPOINT_NAME, last_id=checkpoint))
+                bump_data_version(session)
+                session.commit()
+            except Exception:
+                with self.lock:
+                    self.dirty |= dirty  # write them again next time
+                raise
+        finally:
+            session.close()
+
+        with self.lock:
+            self.flushed_id = checkpoint
+            # _add() skips anything up to the checkpoint by itself
+            self.seen_ids = {i for i in self.seen_ids if i > checkpoint}
+            # Only today and the all-time bucket still get writes
+            today = str(datetime.utcnow().date())
+            for day in list(self.buckets):
+                if day not in (today, ALL_TIME) and day not in self.dirty:
+                    del self.buckets[day]
+        return folded
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    init_db()
+
+    store = SketchStore(SessionLocal)
+    print(f"Folded {store.catch_up()} attacks into sketches (checkpoint id {store.flushed_id})")
@@ -1,9 +1,33 @@
 import json
-try:
-    with open('/home/aayush/Downloads/4thsem/newfolder1/Eigenguard/collected_data/request_log.json', 'r') as f:
-        data = json.load(f)
-    print(f"JSON is valid")
-    print(f"Number of records: {len(data)}")
-    print(f"First record: {data[0] if data else 'Empty'}")
-except json.JSONDecodeError as e:
-    print(f"JSON is invalid: {e}")
\ No newline at end of file
+import os
+import sys
+
+import log_archive
+
+DATA_DIR = os.environ.get("EIGENGUARD_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "collected_data"))
+
+
+def main(path=None):
+    # No path: the whole history (compacted segments via their index, plus
+    # uncompacted archives and the live request_log.json)
+    if path is None:
+        total, opened = log_archive.count(DATA_DIR)
+        print(f"Number of records: {total}")
+        return 0
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        print(f"JSON is valid")
+        print(f"Number of records: {len(data)}")
+        print(f"First record: {data[0] if data else 'Empty'}")
+    except FileNotFoundError:
+        print(f"No request log at {path}")
+        return 1
+    except json.JSONDecodeError as e:
+        print(f"JSON is invalid: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2]))
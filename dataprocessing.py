@@ -1,28 +1,37 @@
 import json
-import pandas as pd
 import os
+import sys
+
+import pandas as pd
 
-DATA_DIR = os.path.expanduser("/home/aayush/Downloads/4thsem/newfolder1/Eigenguard/collected_data")
+DATA_DIR = os.environ.get("EIGENGUARD_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "collected_data"))
 INPUT_JSON = os.path.join(DATA_DIR, "request_log.json")
 OUTPUT_CSV = os.path.join(DATA_DIR, "processed_requests.csv")
 
-os.makedirs(DATA_DIR, exist_ok=True)
 
-try:
-    with open(INPUT_JSON, 'r', encoding='utf-8') as file:
-        json_data = json.load(file)  # Load entire JSON array at once
-except FileNotFoundError:
-    print(f"Error: JSON file {INPUT_JSON} not found.")
-    exit(1)
-except json.JSONDecodeError as e:
-    print(f"Error: Invalid JSON format in {INPUT_JSON}. {e}")
-    exit(1)
+def main(input_json=INPUT_JSON, output_csv=OUTPUT_CSV):
+    os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+
+    try:
+        with open(input_json, 'r', encoding='utf-8') as file:
+            json_data = json.load(file)  # Load entire JSON array at once
+    except FileNotFoundError:
+        print(f"Error: JSON file {input_json} not found.")
+        return 1
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON format in {input_json}. {e}")
+        return 1
+
+    print(f"Number of records read: {len(json_data)}")
+
+    df = pd.DataFrame(json_data)
+    df.to_csv(output_csv, index=False)
 
-print(f"Number of records read: {len(json_data)}")
+    print(f"CSV saved to: {output_csv}")
+    print("\nFirst 5 rows of CSV:")
+    print(df.head())
+    return 0
 
-df = pd.DataFrame(json_data)
-df.to_csv(OUTPUT_CSV, index=False)
 
-print(f"CSV saved to: {OUTPUT_CSV}")
-print("\nFirst 5 rows of CSV:")
-print(df.head())
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:3]))
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# eigenguard.py — one entry point for the honeypot, API, ingestion and ML tools
+#
+#   python eigenguard.py <command> [args...]
+#   ./eigenguard <command> [args...]               (shell wrapper; symlink it onto PATH as `eigenguard`)
+#
+#   init-db                          create/upgrade the honeypot schema (entry points also do this)
+#   honeypot                         SSH honeypot on port 2222
+#   api [--port 8000] [--reload]     dashboard API
+#   ingest collector|ship|pcap|logs  fleet collector, sensor shipper, pcap replay, request-log archives
+#   train flows|anomaly|ids|select   flow classifier / request anomaly pipeline / IDS model / model selection
+#   score [--follow N]               label unscored attacks with the flow model
+#   export attacks|requests|archive  dump the attacks table, request log → CSV, copy old rows to Parquet
+#   plot [--log] [--tiles] [--show]  density/hexbin/histogram PNGs of the request features (headless)
+#   bench api|ingest|pcap|forest|startup  benchmarks
+#   count / validate [path]          quick checks on the request log (whole history, or one JSON file)
+#
+# Only os/sys/time are imported up front; each command imports what it needs
+# (SQLAlchemy, Twisted, pandas, sklearn, DuckDB...) when it runs, so `count`
+# or `--help` don't pay for the whole stack. `--timing` (or EIGENGUARD_TIMING=1)
+# prints how long dispatch and the command took; `bench startup` compares
+# cold-start times of the commands against a bare interpreter.
+import os
+import sys
+import time
+
+T0 = time.perf_counter()
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT, "Honeypot", "backend")
+ML_DIR = os.path.join(ROOT, "machinelearning_part")
+
+
+def _path(directory):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+
+def _run_main(prog, argv, module, directory=BACKEND_DIR, func="main"):
+    # Hand the remaining args to an existing argparse main()
+    _path(directory)
+    sys.argv = [prog] + argv
+    mod = __import__(module, fromlist=[func])
+    return getattr(mod, func)()
+
+
+def _run_module(prog, argv, module, directory=BACKEND_DIR):
+    # For modules whose CLI lives in an `if __name__ == "__main__":` block
+    import runpy
+
+    _path(directory)
+    sys.argv = [prog] + argv
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+def _uvicorn(target, argv, port):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog=f"eigenguard {target.split(':')[0]}")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--reload", action="store_true")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    os.chdir(BACKEND_DIR)  # --reload re-imports from the working directory
+    _path(BACKEND_DIR)
+    uvicorn.run(target, host=args.host, port=args.port, reload=args.reload)
+
+
+# === Commands ===
+
+def cmd_init_db(argv):
+    _path(BACKEND_DIR)
+    from database import DB_PATH, init_db
+
+    init_db()
+    print(f"Schema ready in {DB_PATH}")
+
+
+def cmd_honeypot(argv):
+    os.chdir(BACKEND_DIR)  # honeypot.log is written to the working directory, as with start.sh
+    _run_module("honeypot.py", argv, "honeypot")
+
+
+def cmd_api(argv):
+    _uvicorn("api:app", argv, 8000)
+
+
+def cmd_ingest(argv):
+    return _dispatch("ingest", argv, {
+        "collector": ("central collector for a sensor fleet (uvicorn, port 8100)",
+                      lambda a: _uvicorn("collector:app", a, 8100)),
+        "ship": ("ship unsent rows to HONEYPOT_COLLECTOR_URL once",
+                 lambda a: _run_module("utils/shipper.py", a, "utils.shipper")),
+        "pcap": ("extract CIC flows from pcap files into the attacks table",
+                 lambda a: _run_main("pcap_replay.py", a, "pcap_replay")),
+        "logs": ("compact/count/validate/extract rotated request-log archives",
+                 lambda a: _run_main("log_archive.py", a, "log_archive", ROOT)),
+    })
+
+
+def _ml_steps(argv, steps):
+    # Pipeline scripts read/write CSVs relative to their own folder
+    _path(ML_DIR)
+    os.chdir(ML_DIR)
+    for name in steps:
+        print(f"--- {name}")
+        __import__(name).main()
+
+
+def cmd_train(argv):
+    return _dispatch("train", argv, {
+        "flows": ("fit the flow classifier on CIC-IDS CSVs",
+                  lambda a: _run_main("classify_flows.py", ["train"] + a, "classify_flows")),
+        "anomaly": ("request-log pipeline: preprocess, features, IsolationForest",
+                    lambda a: _ml_steps(a, ["data_preprocessing", "feature_engineering", "anomaly_detection"])),
+        "ids": ("heuristic-labelled RandomForest on processed_requests.csv",
+                lambda a: _ml_steps(a, ["high_accuracy_ids"])),
+        "select": ("cross-validated grid search over RF / IsolationForest (cached, parallel)",
+                   lambda a: _run_main("model_selection.py", a, "model_selection", ML_DIR)),
+    })
+
+
+def cmd_score(argv):
+    return _run_main("classify_flows.py", ["score"] + argv, "classify_flows")
+
+
+def export_attacks(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="eigenguard export attacks")
+    parser.add_argument("--format", default="csv", choices=["csv", "json", "msgpack", "arrow", "parquet"])
+    parser.add_argument("-o", "--out", help="output file (default attacks.<ext>, - for stdout)")
+    parser.add_argument("--since", help="only attacks at or after this timestamp, e.g. 2025-06-01")
+    args = parser.parse_args(argv)
+
+    import asyncio
+
+    _path(BACKEND_DIR)
+    from sqlalchemy import select
+    from database import SessionLocal, Attack
+    from utils.formats import stream_rows
+
+    table = Attack.__table__
+    query = select(table).order_by(table.c.id)
+    if args.since:
+        query = query.where(table.c.timestamp >= args.since)
+    out_path = args.out or "attacks." + {"arrow": "arrows"}.get(args.format, args.format)
+
+    async def batches(result):
+        for rows in result.partitions(50_000):
+            yield rows
+
+    async def write(out):
+        session = SessionLocal()
+        try:
+            result = session.execute(query.execution_options(stream_results=True))
+            async for chunk in stream_rows(args.format, table.columns, batches(result)):
+                out.write(chunk)
+        finally:
+            session.close()
+
+    if out_path == "-":
+        asyncio.run(write(sys.stdout.buffer))
+    else:
+        with open(out_path, "wb") as out:
+            asyncio.run(write(out))
+        print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
+
+
+def export_requests(argv):
+    _path(ROOT)
+    import dataprocessing
+
+    return dataprocessing.main(*argv[:2])
+
+
+def cmd_export(argv):
+    return _dispatch("export", argv, {
+        "attacks": ("dump the attacks table as csv/json/msgpack/arrow/parquet", export_attacks),
+        "requests": ("request_log.json → processed_requests.csv [in.json [out.csv]]", export_requests),
+        "archive": ("copy attacks older than --before into Parquet (--delete removes them from SQLite)",
+                    lambda a: _run_module("utils/analytics.py", ["archive"] + a, "utils.analytics")),
+    })
+
+
+def cmd_plot(argv):
+    return _run_main("density_plots.py", argv, "density_plots", ML_DIR)
+
+
+def cmd_bench(argv):
+    return _dispatch("bench", argv, {
+        "api": ("API throughput under concurrent load", lambda a: _run_main("bench_api.py", a, "bench_api")),
+        "ingest": ("localhost fleet: sensors shipping to one collector",
+                   lambda a: _run_main("bench_ingest.py", a, "bench_ingest")),
+        "pcap": ("pcap flow extraction throughput (--synthetic N)",
+                 lambda a: _run_main("pcap_replay.py", ["--bench"] + a, "pcap_replay")),
+        "forest": ("compiled forest inference vs sklearn, batch 1..10k",
+                   lambda a: _run_module("utils/forest_kernel.py", ["--bench"] + a, "utils.forest_kernel")),
+        "startup": ("cold-start time of each command vs a bare interpreter", bench_startup),
+    })
+
+
+def bench_startup(argv):
+    import statistics
+    import subprocess
+
+    runs = int(argv[0]) if argv else 5
+    me = os.path.abspath(__file__)
+    cases = [
+        ("python -c pass", [sys.executable, "-c", "pass"]),
+        ("eigenguard --help", [sys.executable, me, "--help"]),
+        ("eigenguard count", [sys.executable, me, "count"]),
+        ("eigenguard validate", [sys.executable, me, "validate"]),
+        ("eigenguard ingest logs --help", [sys.executable, me, "ingest", "logs", "--help"]),
+        ("eigenguard score --help", [sys.executable, me, "score", "--help"]),
+        ("import database", [sys.executable, "-c", f"import sys; sys.path.insert(0, {BACKEND_DIR!r}); import database"]),
+        ("import api", [sys.executable, "-c", f"import sys; sys.path.insert(0, {BACKEND_DIR!r}); import api"]),
+    ]
+    print(f"median wall time over {runs} runs")
+    for name, cmd in cases:
+        times = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - t)
+        print(f"  {name:<32} {statistics.median(times) * 1000:8.1f} ms")
+
+
+def cmd_count(argv):
+    _path(ROOT)
+    import count_json
+
+    return count_json.main(*argv[:1])
+
+
+def cmd_validate(argv):
+    _path(ROOT)
+    import validate_json
+
+    return validate_json.main(*argv[:1])
+
+
+COMMANDS = {
+    "init-db": ("create/upgrade the database schema", cmd_init_db),
+    "honeypot": ("run the SSH honeypot", cmd_honeypot),
+    "api": ("run the dashboard API", cmd_api),
+    "ingest": ("collector, shipper, pcap replay, request-log archives", cmd_ingest),
+    "train": ("train models", cmd_train),
+    "score": ("label unscored attacks with the flow model", cmd_score),
+    "export": ("export data", cmd_export),
+    "plot": ("render request-feature plots to machinelearning_part/plots", cmd_plot),
+    "bench": ("benchmarks", cmd_bench),
+    "count": ("count records in the request-log history (or one JSON file)", cmd_count),
+    "validate": ("check the request-log segments and archives (or one JSON file)", cmd_validate),
+}
+
+
+def _usage(prog, commands):
+    width = max(map(len, commands))
+    lines = [f"usage: {prog} <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<{width}}  {help_}" for name, (help_, _) in commands.items()]
+    return "\n".join(lines)
+
+
+def _dispatch(prog, argv, commands):
+    prog = f"eigenguard {prog}".strip()
+    if not argv or argv[0] in ("-h", "--help"):
+        print(_usage(prog, commands))
+        return 0 if argv else 2
+    if argv[0] not in commands:
+        print(f"{prog}: unknown command {argv[0]!r}\n\n{_usage(prog, commands)}", file=sys.stderr)
+        return 2
+    return commands[argv[0]][1](argv[1:])
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    timing = os.environ.get("EIGENGUARD_TIMING") == "1"
+    if argv[:1] == ["--timing"]:
+        timing = True
+        argv = argv[1:]
+    t_dispatch = time.perf_counter()
+    try:
+        status = _dispatch("", argv, COMMANDS)
+    finally:
+        if timing:
+            t_end = time.perf_counter()
+            print(f"[eigenguard] dispatch {(t_dispatch - T0) * 1000:.1f} ms, "
+                  f"command {(t_end - t_dispatch) * 1000:.1f} ms", file=sys.stderr)
+    return status if isinstance(status, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
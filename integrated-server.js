@@ -23,12 +23,22 @@ async function ensureDataDir() {
     }
 }
 
+// Write via a temp file + rename so readers (log_archive.py) never see a half-written file.
+// The .tmp suffix keeps it out of the requests_*.json glob; the counter keeps
+// overlapping saves (one per finished request) from sharing a temp file.
+let tmpCounter = 0;
+async function writeJsonAtomic(file, data, pretty = false) {
+    const tmp = `${file}.${process.pid}.${tmpCounter++}.tmp`;
+    await fs.writeFile(tmp, pretty ? JSON.stringify(data, null, 2) : JSON.stringify(data));
+    await fs.rename(tmp, file);
+}
+
 // Initialize log file if it doesn't exist
 async function initializeLogFile() {
     try {
         await fs.access(LOG_FILE);
     } catch {
-        await fs.writeFile(LOG_FILE, JSON.stringify([]));
+        await writeJsonAtomic(LOG_FILE, []);
         console.log('Log file initialized:', LOG_FILE);
     }
 }
@@ -85,10 +95,10 @@ app.post('/api/clear-data', async (req, res) => {
         const data = JSON.parse(await fs.readFile(LOG_FILE));
         if (data.length > 0) {
             const archiveFile = path.join(DATA_DIR, `requests_${Date.now()}.json`);
-            await fs.writeFile(archiveFile, JSON.stringify(data, null, 2));
+            await writeJsonAtomic(archiveFile, data, true);
         }
 
-        await fs.writeFile(LOG_FILE, JSON.stringify([]));
+        await writeJsonAtomic(LOG_FILE, []);
         res.json({ success: true, message: 'Data cleared successfully' });
     } catch (error) {
         console.error('Error clearing data:', error);
@@ -130,12 +140,12 @@ async function saveRequestData(requestData) {
     try {
         const data = JSON.parse(await fs.readFile(LOG_FILE));
         data.push(requestData);
-        await fs.writeFile(LOG_FILE, JSON.stringify(data, null, 2));
+        await writeJsonAtomic(LOG_FILE, data, true);
 
         if (data.length > 1000) {
             const archiveFile = path.join(DATA_DIR, `requests_${Date.now()}.json`);
-            await fs.writeFile(archiveFile, JSON.stringify(data, null, 2));
-            await fs.writeFile(LOG_FILE, JSON.stringify([]));
+            await writeJsonAtomic(archiveFile, data, true);
+            await writeJsonAtomic(LOG_FILE, []);
         }
     } catch (error) {
         console.error('Error saving request data:', error);
@@ -0,0 +1,396 @@
+# log_archive.py — compaction + time index for the request-log archives
+#
+# integrated-server.js rotates request_log.json into a pretty-printed
+# requests_<epoch>.json every ~1000 requests. This folds those archives into
+# one gzip'd JSON-lines segment per UTC day under collected_data/segments/,
+# described by a sidecar index (segments/index.json) with each segment's time
+# range, record count, checksum and a Bloom filter of client IPs.
+#
+# Each compaction appends its records for a day as a new gzip member (a
+# "part") to that day's segment, so earlier data is never rewritten; the index
+# keeps the byte size, checksum, time range and Bloom filter of every part.
+# Concatenated members are still one valid .gz file (zcat reads it whole).
+#
+# Usage:
+#   python log_archive.py compact                      # fold new archives into segments (sources are deleted)
+#   python log_archive.py count [--since 2025-05-01] [--until 2025-06-01] [--ip 1.2.3.4]
+#   (count_json.py / validate_json.py and `eigenguard count|validate` use this index too)
+#   python log_archive.py validate [--full]
+#   python log_archive.py extract --since 2025-05-05T07 --until 2025-05-06 > slice.jsonl
+#
+# Timestamps are the collector's toISOString() values, so --since/--until
+# take any ISO prefix and compare as strings (since <= ts < until).
+# Counting reads only the index unless a segment straddles the range or an
+# --ip filter passes its Bloom filter. Archives not yet compacted and the live
+# request_log.json are always included so results cover the whole history
+# (one that still fails to parse after a few retries is skipped with a warning).
+import argparse
+import base64
+import glob
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import sys
+import time
+
+DATA_DIR = os.environ.get("EIGENGUARD_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "collected_data"))
+LIVE_LOG = "request_log.json"
+SEGMENT_DIR = "segments"
+INDEX_FILE = "index.json"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # a day's segment gets new parts appended until it reaches this size
+BLOOM_FP_RATE = 0.01
+
+
+class BloomFilter:
+    def __init__(self, m, k, bits=None):
+        self.m = m
+        self.k = k
+        self.bits = bytearray(bits) if bits is not None else bytearray((m + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, n, fp_rate=BLOOM_FP_RATE):
+        n = max(n, 1)
+        m = max(64, int(-n * math.log(fp_rate) / (math.log(2) ** 2)))
+        return cls(m, max(1, round(m / n * math.log(2))))
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def add(self, value):
+        for p in self._positions(value):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+    def to_json(self):
+        return {"m": self.m, "k": self.k, "bits": base64.b64encode(bytes(self.bits)).decode()}
+
+    @classmethod
+    def from_json(cls, d):
+        return cls(d["m"], d["k"], base64.b64decode(d["bits"]))
+
+
+# === Index ===
+
+def _segment_root(data_dir):
+    return os.path.join(data_dir, SEGMENT_DIR)
+
+
+def load_index(data_dir=DATA_DIR):
+    path = os.path.join(_segment_root(data_dir), INDEX_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"version": 1, "consumed": [], "segments": []}
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_index(index, data_dir=DATA_DIR):
+    os.makedirs(_segment_root(data_dir), exist_ok=True)
+    path = os.path.join(_segment_root(data_dir), INDEX_FILE)
+    _write_atomic(path, json.dumps(index, indent=1).encode("utf-8"))
+
+
+# === Segments ===
+
+def _partition(record):
+    ts = record.get("timestamp") or ""
+    return ts[:10] if len(ts) >= 10 else "unknown"
+
+
+def encode_part(records):
+    """Records as one gzip member, sorted by time; returns (payload, part index entry)."""
+    records.sort(key=lambda r: r.get("timestamp") or "")
+    bloom = BloomFilter.for_capacity(len({r.get("ip") for r in records}))
+    lines = []
+    for r in records:
+        if r.get("ip"):
+            bloom.add(str(r["ip"]))
+        lines.append(json.dumps(r, separators=(",", ":"), ensure_ascii=False))
+    payload = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), compresslevel=6)
+    return payload, {
+        "t_min": records[0].get("timestamp") or "",
+        "t_max": records[-1].get("timestamp") or "",
+        "count": len(records),
+        "bytes": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "bloom": bloom.to_json(),
+    }
+
+
+def _parts(segment):
+    # Index entries written before parts existed describe a single member
+    return segment.get("parts") or [segment]
+
+
+def write_segment(data_dir, partition, records):
+    """Write records to a new segment file; returns its index entry."""
+    payload, part = encode_part(records)
+    name = f"{partition}-{time.time_ns()}.jsonl.gz"
+    os.makedirs(_segment_root(data_dir), exist_ok=True)
+    _write_atomic(os.path.join(_segment_root(data_dir), name), payload)
+    return {
+        "file": name,
+        "partition": partition,
+        "t_min": part["t_min"],
+        "t_max": part["t_max"],
+        "count": part["count"],
+        "bytes": part["bytes"],
+        "parts": [part],
+    }
+
+
+def append_part(data_dir, segment, records):
+    """Append records to a segment file as a new gzip member and update its index entry in place."""
+    payload, part = encode_part(records)
+    with open(os.path.join(_segment_root(data_dir), segment["file"]), "r+b") as f:
+        # Cut off anything the index doesn't know about (a run that crashed before saving it)
+        f.truncate(segment["bytes"])
+        f.seek(segment["bytes"])
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    segment["parts"] = [{k: p[k] for k in part} for p in _parts(segment)] + [part]
+    segment.pop("sha256", None)
+    segment.pop("bloom", None)
+    segment["t_min"] = min(segment["t_min"], part["t_min"])
+    segment["t_max"] = max(segment["t_max"], part["t_max"])
+    segment["count"] += part["count"]
+    segment["bytes"] += part["bytes"]
+
+
+def read_segment(data_dir, segment):
+    with open(os.path.join(_segment_root(data_dir), segment["file"]), "rb") as f:
+        data = f.read(segment["bytes"])  # not a part that is being appended right now
+    with gzip.open(io.BytesIO(data), "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def pending_archives(data_dir=DATA_DIR, index=None):
+    index = index or load_index(data_dir)
+    consumed = set(index["consumed"])
+    return sorted(
+        (p for p in glob.glob(os.path.join(data_dir, "requests_*.json")) if os.path.basename(p) not in consumed),
+        key=lambda p: os.path.basename(p),
+    )
+
+
+def _read_log(path, warn=True, retries=3):
+    """Parse a request_log.json / requests_*.json. Returns None (with a warning)
+    if it's still unparsable after a few retries, e.g. caught mid-write by an
+    older integrated-server.js that rewrote files in place. warn=False raises instead."""
+    for attempt in range(retries):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None  # rotated away between glob and open
+        except json.JSONDecodeError as e:
+            if attempt + 1 < retries:
+                time.sleep(0.1)
+            elif warn:
+                print(f"warning: skipping {os.path.basename(path)}: invalid JSON ({e})", file=sys.stderr)
+            else:
+                raise
+
+
+def compact(data_dir=DATA_DIR, keep_sources=False):
+    """Fold all pending archives into segments. Returns (archives, records)."""
+    index = load_index(data_dir)
+    sources = pending_archives(data_dir, index)
+    if not sources:
+        return 0, 0
+
+    by_partition = {}
+    readable = []
+    for path in sources:
+        records = _read_log(path)
+        if records is None:
+            continue  # stays pending for the next run
+        readable.append(path)
+        for record in records:
+            by_partition.setdefault(_partition(record), []).append(record)
+    sources = readable
+    if not sources:
+        return 0, 0
+
+    for partition, records in by_partition.items():
+        # Append to the day's last segment while it's small; otherwise start a new one
+        open_seg = next(
+            (s for s in reversed(index["segments"]) if s["partition"] == partition and s["bytes"] < SEGMENT_MAX_BYTES),
+            None,
+        )
+        if open_seg is not None:
+            append_part(data_dir, open_seg, records)
+        else:
+            index["segments"].append(write_segment(data_dir, partition, records))
+
+    # Order matters for crash safety: new data is on disk before the index
+    # counts it (append_part() cuts off parts the index never saw), and
+    # sources go only after the index moved on.
+    index["segments"].sort(key=lambda s: (s["t_min"], s["file"]))
+    # A consumed name only matters while its archive is still there (--keep-sources)
+    index["consumed"] = [
+        name for name in index["consumed"] if os.path.exists(os.path.join(data_dir, name))
+    ] + [os.path.basename(p) for p in sources]
+    save_index(index, data_dir)
+    if not keep_sources:
+        for path in sources:
+            os.remove(path)
+    return len(sources), sum(len(r) for r in by_partition.values())
+
+
+# === Queries ===
+
+def _in_range(ts, since, until):
+    return (since is None or ts >= since) and (until is None or ts < until)
+
+
+def _uncompacted_records(data_dir, index):
+    paths = pending_archives(data_dir, index)
+    live = os.path.join(data_dir, LIVE_LOG)
+    if os.path.exists(live):
+        paths.append(live)
+    for path in paths:
+        yield from _read_log(path) or ()
+
+
+def _candidate_segments(index, since, until, ip):
+    for seg in index["segments"]:
+        if since is not None and seg["t_max"] < since:
+            continue
+        if until is not None and seg["t_min"] >= until:
+            continue
+        if ip is not None and not any(ip in BloomFilter.from_json(p["bloom"]) for p in _parts(seg)):
+            continue
+        yield seg
+
+
+def iter_records(data_dir=DATA_DIR, since=None, until=None, ip=None):
+    """All records in [since, until) (optionally from one IP), oldest segments first."""
+    index = load_index(data_dir)
+    match = lambda r: _in_range(r.get("timestamp") or "", since, until) and (ip is None or str(r.get("ip")) == ip)
+    for seg in _candidate_segments(index, since, until, ip):
+        yield from (r for r in read_segment(data_dir, seg) if match(r))
+    yield from (r for r in _uncompacted_records(data_dir, index) if match(r))
+
+
+def count(data_dir=DATA_DIR, since=None, until=None, ip=None):
+    """Returns (records, segments actually opened)."""
+    index = load_index(data_dir)
+    total = opened = 0
+    for seg in _candidate_segments(index, since, until, ip):
+        inside = _in_range(seg["t_min"], since, until) and _in_range(seg["t_max"], since, until)
+        if inside and ip is None:
+            total += seg["count"]  # answered by the index alone
+            continue
+        opened += 1
+        total += sum(
+            1 for r in read_segment(data_dir, seg)
+            if _in_range(r.get("timestamp") or "", since, until) and (ip is None or str(r.get("ip")) == ip)
+        )
+    total += sum(
+        1 for r in _uncompacted_records(data_dir, index)
+        if _in_range(r.get("timestamp") or "", since, until) and (ip is None or str(r.get("ip")) == ip)
+    )
+    return total, opened
+
+
+def validate(data_dir=DATA_DIR, full=False):
+    """Checksum every segment (and with full=True re-parse it against the index). Returns a list of problems."""
+    index = load_index(data_dir)
+    problems = []
+    for seg in index["segments"]:
+        path = os.path.join(_segment_root(data_dir), seg["file"])
+        try:
+            with open(path, "rb") as f:
+                bad = [i for i, p in enumerate(_parts(seg)) if hashlib.sha256(f.read(p["bytes"])).hexdigest() != p["sha256"]]
+        except FileNotFoundError:
+            problems.append(f"{seg['file']}: missing")
+            continue
+        if bad:
+            problems.append(f"{seg['file']}: checksum mismatch in part {', '.join(map(str, bad))}")
+            continue
+        if full:
+            try:
+                stamps = [r.get("timestamp") or "" for r in read_segment(data_dir, seg)]
+            except (OSError, EOFError, ValueError) as e:
+                problems.append(f"{seg['file']}: unreadable ({e})")
+                continue
+            if len(stamps) != seg["count"]:
+                problems.append(f"{seg['file']}: {len(stamps)} records, index says {seg['count']}")
+            elif stamps and (min(stamps) != seg["t_min"] or max(stamps) != seg["t_max"]):
+                problems.append(f"{seg['file']}: time range differs from index")
+
+    paths = pending_archives(data_dir, index)
+    if os.path.exists(os.path.join(data_dir, LIVE_LOG)):
+        paths.append(os.path.join(data_dir, LIVE_LOG))
+    for path in paths:
+        try:
+            _read_log(path, warn=False)
+        except json.JSONDecodeError as e:
+            problems.append(f"{os.path.basename(path)}: invalid JSON ({e})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and query the collected request-log archives")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("compact", help="fold requests_*.json archives into indexed segments")
+    p.add_argument("--keep-sources", action="store_true", help="don't delete archives after compaction")
+
+    for name in ("count", "extract"):
+        p = sub.add_parser(name)
+        p.add_argument("--since", help="ISO timestamp or prefix, inclusive")
+        p.add_argument("--until", help="ISO timestamp or prefix, exclusive")
+        p.add_argument("--ip")
+
+    p = sub.add_parser("validate")
+    p.add_argument("--full", action="store_true", help="re-read every segment, not just checksums")
+
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        t0 = time.perf_counter()
+        archives, records = compact(args.data_dir, args.keep_sources)
+        print(f"Compacted {archives} archives ({records} records) in {time.perf_counter() - t0:.2f}s")
+    elif args.command == "count":
+        t0 = time.perf_counter()
+        total, opened = count(args.data_dir, args.since, args.until, args.ip)
+        segments = len(load_index(args.data_dir)["segments"])
+        print(f"Number of records: {total}")
+        print(f"(opened {opened} of {segments} segments, {(time.perf_counter() - t0) * 1000:.1f} ms)")
+    elif args.command == "extract":
+        out = sys.stdout
+        for record in iter_records(args.data_dir, args.since, args.until, args.ip):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    elif args.command == "validate":
+        problems = validate(args.data_dir, args.full)
+        if problems:
+            print("\n".join(problems))
+            sys.exit(1)
+        print("All segments and archives are valid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# density_plots.py — headless density / hexbin / histogram plots of the request features
+#
+# scatterplot.py and visualization.py used to read ml_features.csv whole, draw
+# one marker per request and open a window with plt.show(). Over SSH there is
+# no window, and with millions of requests the DataFrame and the scatter
+# artists take gigabytes and minutes. Here both CSVs are streamed in chunks
+# and every chunk is binned with NumPy into fixed-size grids:
+#   density   2-D histogram (x, y), all requests with the anomalies on top
+#   hexbin    same data on matplotlib's hexagon lattice, normal vs anomalous
+#   hist_*    1-D histogram per column, normal vs anomalous
+#   labels    normal vs anomalous request counts
+# The plots are drawn from the grids with the Agg backend and written as PNG
+# or SVG. Memory and drawing time depend on --bins / --gridsize, not on how
+# many rows the CSVs have. Each file is read twice: first for the axis ranges,
+# then for the counts. Pass --extent to skip the first read.
+#
+# anomalies.csv holds only the rows IsolationForest flagged (a subset of
+# ml_features.csv), so "normal" = all rows minus anomalies, bin by bin.
+#
+# --tiles also renders the density grid as a 256px tile pyramid in
+# <out>/tiles/{z}/{x}/{y}.png (z=0 is the whole plot, y=0 at the top) plus
+# tiles.json with the extent. The API serves it under /plots/ when
+# HONEYPOT_PLOTS_DIR points at <out>.
+#
+# Usage:
+#   python density_plots.py                                     # PNGs in plots/
+#   python density_plots.py --format svg --log --bins 512
+#   python density_plots.py --x hour --y responseTime --tiles --max-zoom 4
+#   python density_plots.py --show                              # also open windows (needs a display)
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURES_PATH = os.path.join(BASE_DIR, "ml_features.csv")
+ANOMALIES_PATH = os.path.join(BASE_DIR, "anomalies.csv")
+PLOTS_DIR = os.environ.get("EIGENGUARD_PLOTS_DIR", os.path.join(BASE_DIR, "plots"))
+CHUNK_ROWS = 500_000
+TILE_PX = 256
+PLOTS = ("density", "hexbin", "hist", "labels")
+
+
+def _pyplot(show=False):
+    # Agg draws straight to files — no display, works over SSH and in cron
+    import matplotlib
+
+    if not show:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+# === Streaming ===
+
+def iter_chunks(path, columns, log=False, chunk_rows=CHUNK_ROWS):
+    """(n, len(columns)) float64 blocks of `path`; NaN where a value is missing."""
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+        block = chunk[columns].to_numpy(dtype=np.float64)
+        if log:
+            block = np.log1p(np.clip(block, 0.0, None))
+        yield block
+
+
+def scan_ranges(path, columns, log=False, chunk_rows=CHUNK_ROWS):
+    """Per-column (min, max) over the whole file, one chunk at a time."""
+    lo = np.full(len(columns), np.inf)
+    hi = np.full(len(columns), -np.inf)
+    for block in iter_chunks(path, columns, log, chunk_rows):
+        with np.errstate(invalid="ignore"):
+            lo = np.fmin(lo, np.nanmin(block, axis=0, initial=np.inf))
+            hi = np.fmax(hi, np.nanmax(block, axis=0, initial=-np.inf))
+    empty = lo > hi
+    lo[empty], hi[empty] = 0.0, 1.0
+    flat = lo == hi  # a constant column still needs a non-empty range
+    lo[flat] -= 0.5
+    hi[flat] += 0.5
+    return lo, hi
+
+
+# === Binning ===
+
+def hex_lattice(extent, gridsize):
+    # The hexagon grid plt.hexbin uses for this extent: two offset rectangular
+    # lattices of centres, (nx+1)*(ny+1) and nx*ny, with the same 1e-9 padding
+    xmin, xmax, ymin, ymax = extent
+    nx = gridsize
+    ny = int(nx / np.sqrt(3))
+    padding = 1e-9 * (xmax - xmin)
+    xmin, xmax = xmin - padding, xmax + padding
+    return nx, ny, xmin, (xmax - xmin) / nx, ymin, (ymax - ymin) / ny
+
+
+def hex_counts(x, y, extent, gridsize):
+    """Points per hexagon, binned exactly like plt.hexbin(x, y, extent=extent, gridsize=gridsize)."""
+    nx, ny, xmin, sx, ymin, sy = hex_lattice(extent, gridsize)
+    ix = (x - xmin) / sx
+    iy = (y - ymin) / sy
+    ix1, iy1 = np.round(ix).astype(np.int64), np.round(iy).astype(np.int64)
+    ix2, iy2 = np.floor(ix).astype(np.int64), np.floor(iy).astype(np.int64)
+    first = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2 < (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+
+    ok1 = first & (ix1 >= 0) & (ix1 <= nx) & (iy1 >= 0) & (iy1 <= ny)
+    ok2 = ~first & (ix2 >= 0) & (ix2 < nx) & (iy2 >= 0) & (iy2 < ny)
+    c1 = np.bincount(ix1[ok1] * (ny + 1) + iy1[ok1], minlength=(nx + 1) * (ny + 1))
+    c2 = np.bincount(ix2[ok2] * ny + iy2[ok2], minlength=nx * ny)
+    return np.concatenate([c1, c2])
+
+
+def hex_centers(extent, gridsize):
+    nx, ny, xmin, sx, ymin, sy = hex_lattice(extent, gridsize)
+    i1, j1 = np.meshgrid(np.arange(nx + 1), np.arange(ny + 1), indexing="ij")
+    i2, j2 = np.meshgrid(np.arange(nx), np.arange(ny), indexing="ij")
+    x = np.concatenate([i1.ravel(), i2.ravel() + 0.5]) * sx + xmin
+    y = np.concatenate([j1.ravel(), j2.ravel() + 0.5]) * sy + ymin
+    return x, y
+
+
+class Grids:
+    """Fixed-size counts for one set of rows, filled chunk by chunk.
+
+    Columns of each block: x, y, then any extra histogram columns.
+    """
+
+    def __init__(self, lo, hi, bins=256, gridsize=60, hist_bins=50, tile_bins=0):
+        self.extent = (lo[0], hi[0], lo[1], hi[1])
+        self.gridsize = gridsize
+        self.rows = 0
+        self.xedges = np.linspace(lo[0], hi[0], bins + 1)
+        self.yedges = np.linspace(lo[1], hi[1], bins + 1)
+        self.density = np.zeros((bins, bins))  # [x bin, y bin], as np.histogram2d
+        nx, ny = hex_lattice(self.extent, gridsize)[:2]
+        self.hexes = np.zeros((nx + 1) * (ny + 1) + nx * ny, np.int64)
+        self.hist_edges = [np.linspace(a, b, hist_bins + 1) for a, b in zip(lo, hi)]
+        self.hists = [np.zeros(hist_bins) for _ in self.hist_edges]
+        self.tiles = np.zeros((tile_bins, tile_bins)) if tile_bins else None
+
+    def add(self, block):
+        self.rows += len(block)
+        for i, edges in enumerate(self.hist_edges):
+            col = block[:, i]
+            self.hists[i] += np.histogram(col[np.isfinite(col)], bins=edges)[0]
+
+        xy = block[:, :2]
+        xy = xy[np.isfinite(xy).all(axis=1)]
+        x, y = xy[:, 0], xy[:, 1]
+        self.density += np.histogram2d(x, y, bins=(self.xedges, self.yedges))[0]
+        self.hexes += hex_counts(x, y, self.extent, self.gridsize)
+        if self.tiles is not None:
+            n = len(self.tiles)
+            self.tiles += np.histogram2d(x, y, bins=n, range=[self.extent[:2], self.extent[2:]])[0]
+
+    def __sub__(self, other):
+        # Counts of the rows in self but not in other (same binning)
+        out = Grids.__new__(Grids)
+        out.__dict__.update(self.__dict__)
+        out.rows = self.rows - other.rows
+        out.density = self.density - other.density
+        out.hexes = self.hexes - other.hexes
+        out.hists = [a - b for a, b in zip(self.hists, other.hists)]
+        out.tiles = None if self.tiles is None else self.tiles - other.tiles
+        return out
+
+
+def aggregate(path, columns, lo, hi, log=False, chunk_rows=CHUNK_ROWS, **grid_args):
+    grids = Grids(lo, hi, **grid_args)
+    for block in iter_chunks(path, columns, log, chunk_rows):
+        grids.add(block)
+    return grids
+
+
+# === Rendering ===
+
+def _label(column, log):
+    return f"log1p({column})" if log else column
+
+
+def plot_density(plt, allrows, anomalies, columns, log):
+    from matplotlib.colors import LogNorm
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    extent = allrows.extent
+    if allrows.density.max() > 0:
+        im = ax.imshow(np.ma.masked_equal(allrows.density.T, 0), origin="lower", extent=extent, aspect="auto",
+                       cmap="Blues", norm=LogNorm(1, allrows.density.max()), interpolation="nearest")
+        fig.colorbar(im, ax=ax, label="requests per bin")
+    if anomalies.density.max() > 0:
+        ax.imshow(np.ma.masked_equal(anomalies.density.T, 0), origin="lower", extent=extent, aspect="auto",
+                  cmap="Reds", norm=LogNorm(1, anomalies.density.max()), interpolation="nearest", alpha=0.8)
+    ax.set_xlabel(_label(columns[0], log))
+    ax.set_ylabel(_label(columns[1], log))
+    ax.set_title(f"Request density ({allrows.rows:,} requests, anomalies in red)")
+    return fig
+
+
+def plot_hexbin(plt, normal, anomalies, columns, log):
+    from matplotlib.colors import LogNorm
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    x, y = hex_centers(normal.extent, normal.gridsize)
+    for grids, cmap, name in ((normal, "Blues", "Genuine"), (anomalies, "Reds", "Anomalous")):
+        used = grids.hexes > 0
+        if not used.any():
+            continue
+        # One point per non-empty hexagon, weighted by its count: drawing cost
+        # is the number of hexagons, not the number of requests
+        ax.hexbin(x[used], y[used], C=grids.hexes[used], reduce_C_function=np.sum, gridsize=grids.gridsize,
+                  extent=grids.extent, cmap=cmap, norm=LogNorm(1, grids.hexes.max()), alpha=0.75,
+                  linewidths=0.2, label=name)
+    ax.set_xlabel(_label(columns[0], log))
+    ax.set_ylabel(_label(columns[1], log))
+    ax.set_title("Genuine (blue) vs Anomalous (red) HTTP Requests")
+    ax.grid(True)
+    return fig
+
+
+def plot_hist(plt, normal, anomalies, i, column, log):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    edges = normal.hist_edges[i]
+    ax.stairs(normal.hists[i], edges, fill=True, alpha=0.5, color="blue", label="Genuine")
+    ax.stairs(anomalies.hists[i], edges, fill=True, alpha=0.7, color="red", label="Anomalous")
+    if normal.hists[i].max() > 0:
+        ax.set_yscale("log")
+    ax.set_title(f"{column} distribution")
+    ax.set_xlabel(_label(column, log))
+    ax.set_ylabel("Frequency")
+    ax.legend()
+    return fig
+
+
+def plot_labels(plt, normal, anomalies):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.bar(["1", "-1"], [normal.rows, anomalies.rows], color=["blue", "red"])
+    ax.set_title("Normal vs Anomalous Requests")
+    ax.set_xlabel("Label (1=Normal, -1=Anomaly)")
+    ax.set_ylabel("Count")
+    return fig
+
+
+def write_tiles(grid, extent, out_dir, max_zoom, columns, log, cmap="viridis"):
+    """256px PNG pyramid of a (TILE_PX << max_zoom)² count grid, empty tiles skipped."""
+    import matplotlib
+    from matplotlib.colors import LogNorm
+    from matplotlib.image import imsave
+
+    colormap = matplotlib.colormaps[cmap].with_extremes(bad=(0, 0, 0, 0))  # empty bins transparent
+    image = grid.T[::-1]  # rows = y, top row = largest y
+    side = len(image)
+    written = 0
+    for z in range(max_zoom + 1):
+        f = side // (TILE_PX << z)
+        level = image.reshape(side // f, f, side // f, f).sum(axis=(1, 3))  # merge f×f bins
+        if level.max() == 0:
+            continue
+        rgba = colormap(LogNorm(1, level.max())(np.ma.masked_equal(level, 0)), bytes=True)
+        for ty in range(1 << z):
+            for tx in range(1 << z):
+                rows, cols = slice(ty * TILE_PX, (ty + 1) * TILE_PX), slice(tx * TILE_PX, (tx + 1) * TILE_PX)
+                if not level[rows, cols].any():
+                    continue
+                path = os.path.join(out_dir, str(z), str(tx))
+                os.makedirs(path, exist_ok=True)
+                imsave(os.path.join(path, f"{ty}.png"), rgba[rows, cols])
+                written += 1
+    with open(os.path.join(out_dir, "tiles.json"), "w") as f:
+        json.dump({"x": columns[0], "y": columns[1], "log1p": log, "extent": [float(v) for v in extent],
+                   "tile_size": TILE_PX, "max_zoom": max_zoom, "url": "{z}/{x}/{y}.png"}, f, indent=2)
+    return written
+
+
+# === CLI ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless density/hexbin/histogram plots of ml_features.csv")
+    parser.add_argument("--features", default=FEATURES_PATH)
+    parser.add_argument("--anomalies", default=ANOMALIES_PATH)
+    parser.add_argument("--out", default=PLOTS_DIR, help="output directory (default %(default)s)")
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    parser.add_argument("--plots", nargs="+", default=list(PLOTS), choices=PLOTS)
+    parser.add_argument("--x", default="responseTime")
+    parser.add_argument("--y", default="responseSize")
+    parser.add_argument("--hist", nargs="*", default=None, metavar="COLUMN",
+                        help="histogram columns (default: x and y)")
+    parser.add_argument("--log", action="store_true", help="bin log1p(value) — for heavy-tailed times/sizes")
+    parser.add_argument("--bins", type=int, default=256, help="density grid is bins x bins")
+    parser.add_argument("--gridsize", type=int, default=60, help="hexagons across")
+    parser.add_argument("--hist-bins", type=int, default=50)
+    parser.add_argument("--extent", type=float, nargs=4, metavar=("XMIN", "XMAX", "YMIN", "YMAX"),
+                        help="fix the x/y range (after --log) instead of scanning the file for it")
+    parser.add_argument("--tiles", action="store_true", help="also write a tile pyramid to <out>/tiles")
+    parser.add_argument("--max-zoom", type=int, default=3)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--dpi", type=int, default=120)
+    parser.add_argument("--show", action="store_true", help="also open the figures in a window")
+    args = parser.parse_args(argv)
+
+    columns = [args.x, args.y] + [c for c in (args.hist or []) if c not in (args.x, args.y)]
+    hist_columns = args.hist if args.hist else [args.x, args.y]
+    t0 = time.perf_counter()
+
+    if args.extent and len(columns) == 2:
+        lo, hi = np.array(args.extent[0::2]), np.array(args.extent[1::2])
+    else:
+        lo, hi = scan_ranges(args.features, columns, args.log, args.chunk_rows)
+        if args.extent:
+            lo[:2], hi[:2] = args.extent[0::2], args.extent[1::2]
+    grid_args = dict(bins=args.bins, gridsize=args.gridsize, hist_bins=args.hist_bins,
+                     tile_bins=(TILE_PX << args.max_zoom) if args.tiles else 0)
+    allrows = aggregate(args.features, columns, lo, hi, args.log, args.chunk_rows, **grid_args)
+    if os.path.exists(args.anomalies):
+        anomalies = aggregate(args.anomalies, columns, lo, hi, args.log, args.chunk_rows, **grid_args)
+    else:
+        print(f"{args.anomalies} not found — plotting every request as normal")
+        anomalies = Grids(lo, hi, **grid_args)
+    normal = allrows - anomalies
+    t_bin = time.perf_counter()
+    print(f"Binned {allrows.rows:,} requests ({anomalies.rows:,} anomalous) in {t_bin - t0:.1f}s")
+
+    plt = _pyplot(args.show)
+    os.makedirs(args.out, exist_ok=True)
+    figures = []
+    if "density" in args.plots:
+        figures.append(("density", plot_density(plt, allrows, anomalies, columns, args.log)))
+    if "hexbin" in args.plots:
+        figures.append(("hexbin", plot_hexbin(plt, normal, anomalies, columns, args.log)))
+    if "hist" in args.plots:
+        for column in hist_columns:
+            i = columns.index(column)
+            figures.append((f"hist_{column}", plot_hist(plt, normal, anomalies, i, column, args.log)))
+    if "labels" in args.plots:
+        figures.append(("labels", plot_labels(plt, normal, anomalies)))
+    for name, fig in figures:
+        path = os.path.join(args.out, f"{name}.{args.format}")
+        fig.savefig(path, dpi=args.dpi, bbox_inches="tight")
+        print(f"  wrote {path}")
+
+    if args.tiles:
+        tiles_dir = os.path.join(args.out, "tiles")
+        written = write_tiles(allrows.tiles, allrows.extent, tiles_dir, args.max_zoom, columns, args.log)
+        print(f"  wrote {written} tiles to {tiles_dir}")
+    print(f"Rendered in {time.perf_counter() - t_bin:.1f}s")
+
+    if args.show:
+        plt.show()
+    else:
+        plt.close("all")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -96,7 +96,7 @@ def train_high_accuracy_model(X, y):
     return y_test, y_pred, clf
 
 
-if __name__ == "__main__":
+def main():
     # 1. Load and Label
     # We use processed_requests.csv because it contains the raw text needed for labeling
     input_file = "processed_requests.csv"
@@ -106,7 +106,7 @@ if __name__ == "__main__":
         print(
             f"Error: {input_file} not found. Please ensure it is in the current directory."
         )
-        exit()
+        return
 
     # 2. Extract Features
     X, y = extract_features(df_raw)
@@ -126,3 +126,7 @@ if __name__ == "__main__":
         "\nNote: 'Precision' reflects how many predicted attacks were actually attacks."
     )
     print("'Recall' reflects how many actual attacks were correctly detected.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import io
+import urllib.request
+
+import pandas as pd
+
+API_URL = "http://localhost:8000"
+
+
+def fetch(path, fmt="arrow", api_url=API_URL):
+    with urllib.request.urlopen(f"{api_url}{path}{'&' if '?' in path else '?'}format={fmt}") as resp:
+        return resp.read()
+
+
+def load_attacks(fmt="arrow", api_url=API_URL):
+    """
+    Pulls the whole honeypot attacks table from the API into a DataFrame.
+    Arrow (default) and Parquet come back as typed columns, so pandas can use
+    the numeric buffers directly instead of parsing text.
+    """
+    body = fetch("/api/export-csv", fmt, api_url)
+
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        return pa.ipc.open_stream(body).read_all().to_pandas(split_blocks=True, self_destruct=True)
+    if fmt == "parquet":
+        return pd.read_parquet(io.BytesIO(body))
+    if fmt == "msgpack":
+        import msgpack
+
+        return pd.concat(
+            (pd.DataFrame(batch) for batch in msgpack.Unpacker(io.BytesIO(body))),
+            ignore_index=True,
+        )
+    if fmt == "json":
+        return pd.read_json(io.BytesIO(body))
+    return pd.read_csv(io.BytesIO(body), parse_dates=["timestamp"])
+
+
+def load_campaigns(api_url=API_URL, limit=100_000):
+    """
+    Per-attacker campaign aggregates (see Honeypot/backend/utils/campaigns.py),
+    with flow_stats flattened into columns like flow_duration_mean.
+    """
+    import json
+
+    df = pd.read_json(io.BytesIO(fetch(f"/api/campaigns?limit={limit}", "json", api_url)))
+    if df.empty:
+        return df
+    stats = pd.json_normalize(df.pop("flow_stats").map(json.loads).tolist(), sep="_")
+    return pd.concat([df, stats], axis=1)
+
+
+if __name__ == "__main__":
+    df = load_attacks()
+    print(f"Loaded {len(df)} attacks with {len(df.columns)} columns")
+    print(df.head())
@@ -0,0 +1,342 @@
+# model_selection.py — cross-validated model/hyperparameter search for the request IDS
+#
+# Labels and features come from high_accuracy_ids.py (heuristic ground truth
+# on processed_requests.csv). Every configuration in GRIDS is evaluated on
+#   stratified  StratifiedKFold (shuffled) — the usual estimate
+#   time        TimeSeriesSplit on rows sorted by timestamp — train on the past,
+#               test on the future, which is how the model is actually used
+# for both RandomForestClassifier and IsolationForest (fit without labels,
+# scored against them). Each (config, split, fold) is one trial, run across a
+# process pool; models inside a trial use one core so trials don't fight.
+#
+# Caching (MODEL_CACHE_DIR, default .model_cache/ next to this file):
+#   - the feature matrix is built once per dataset + feature-code version and
+#     saved as .npy, so workers memory-map it instead of re-parsing the CSV
+#   - fold indices are saved per split scheme, so every trial sees the same folds
+#   - finished trials are appended to trials.jsonl; a re-run only computes
+#     configurations (or folds) it hasn't seen
+#
+# Usage:
+#   python model_selection.py                               # both models, both splits, 5 folds
+#   python model_selection.py --models rf --split time --jobs 4
+#   python model_selection.py --quick                       # small grid
+#   python model_selection.py --report results.csv
+# Output: one row per configuration with mean±std F1 / precision / recall /
+# ROC-AUC and fit / predict throughput (rows/s), best first.
+import argparse
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(BASE_DIR, ".model_cache"))
+DATA_PATH = os.path.join(BASE_DIR, "processed_requests.csv")
+RANDOM_STATE = 42
+
+GRIDS = {
+    "rf": {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [None, 10, 20],
+        "min_samples_leaf": [1, 5],
+        "class_weight": ["balanced"],
+    },
+    "iforest": {
+        "n_estimators": [100, 200],
+        "contamination": [0.01, 0.05, 0.1],
+        "max_samples": ["auto", 1024],
+    },
+}
+
+QUICK_GRIDS = {
+    "rf": {"n_estimators": [50, 100], "max_depth": [None, 10], "class_weight": ["balanced"]},
+    "iforest": {"n_estimators": [100], "contamination": [0.05, 0.1]},
+}
+
+
+def expand(grid):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_model(name, params):
+    if name == "rf":
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+    if name == "iforest":
+        from sklearn.ensemble import IsolationForest
+
+        return IsolationForest(random_state=RANDOM_STATE, n_jobs=1, **params)
+    raise ValueError(f"Unknown model {name!r}")
+
+
+# === Feature + fold cache ===
+
+def _digest(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+    return h.hexdigest()[:16]
+
+
+def dataset_key(path):
+    """Changes when the CSV or the labeling/feature code changes."""
+    import high_accuracy_ids
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    code = inspect.getsource(high_accuracy_ids.load_and_label_data) + inspect.getsource(high_accuracy_ids.extract_features)
+    return _digest(h.digest(), code)
+
+
+def prepare_features(path, cache_dir=CACHE_DIR):
+    """Build (or reuse) X.npy / y.npy / order.npy for this dataset. Returns the cache prefix."""
+    key = dataset_key(path)
+    prefix = os.path.join(cache_dir, f"features-{key}")
+    if os.path.exists(prefix + ".done"):
+        return prefix
+
+    import pandas as pd
+    from high_accuracy_ids import extract_features, load_and_label_data
+
+    os.makedirs(cache_dir, exist_ok=True)
+    df = load_and_label_data(path)
+    X, y = extract_features(df)
+    # Row order by time, for the time-based split (ties keep file order)
+    order = np.argsort(pd.to_datetime(df["timestamp"]).to_numpy(), kind="stable")
+    np.save(prefix + ".X.npy", np.ascontiguousarray(X.to_numpy(dtype=np.float32)))
+    np.save(prefix + ".y.npy", y.to_numpy(dtype=np.int8))
+    np.save(prefix + ".order.npy", order)
+    with open(prefix + ".done", "w") as f:
+        json.dump({"source": os.path.abspath(path), "rows": len(y), "features": list(X.columns)}, f)
+    return prefix
+
+
+def prepare_folds(prefix, split, folds):
+    """Fold indices for one split scheme, saved next to the features. Returns (path, folds actually used)."""
+    path = f"{prefix}.folds-{split}-{folds}.npz"
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return path, len(data.files) // 2
+
+    y = np.load(prefix + ".y.npy")
+    if split == "stratified":
+        from sklearn.model_selection import StratifiedKFold
+
+        minority = int(np.bincount(y).min()) if len(np.unique(y)) > 1 else 0
+        if minority < 2:
+            raise SystemExit("Stratified folds need at least 2 rows of each class")
+        n = min(folds, minority)
+        if n < folds:
+            print(f"Only {minority} rows in the smallest class — using {n} stratified folds")
+        splitter = StratifiedKFold(n_splits=n, shuffle=True, random_state=RANDOM_STATE)
+        pairs = list(splitter.split(np.zeros(len(y)), y))
+    elif split == "time":
+        from sklearn.model_selection import TimeSeriesSplit
+
+        order = np.load(prefix + ".order.npy")
+        n = folds
+        pairs = [(order[tr], order[te]) for tr, te in TimeSeriesSplit(n_splits=n).split(order)]
+    else:
+        raise ValueError(f"Unknown split {split!r}")
+
+    arrays = {}
+    for i, (train_idx, test_idx) in enumerate(pairs):
+        arrays[f"train{i}"] = train_idx
+        arrays[f"test{i}"] = test_idx
+    np.savez(path, **arrays)
+    return path, n
+
+
+# === Trials ===
+
+_arrays = {}  # per worker process: memory-mapped features and fold indices
+
+
+def _load(path, mmap=True):
+    if path not in _arrays:
+        _arrays[path] = np.load(path, mmap_mode="r") if mmap and path.endswith(".npy") else dict(np.load(path))
+    return _arrays[path]
+
+
+def run_trial(task):
+    """Fit and score one (model, params, split, fold). Runs in a worker process."""
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    X = _load(task["prefix"] + ".X.npy")
+    y = _load(task["prefix"] + ".y.npy")
+    folds = _load(task["folds_path"])
+    train_idx, test_idx = folds[f"train{task['fold']}"], folds[f"test{task['fold']}"]
+    X_train, X_test = X[np.sort(train_idx)], X[test_idx]
+    y_train, y_test = y[np.sort(train_idx)], y[test_idx]
+
+    model = build_model(task["model"], task["params"])
+    t0 = time.perf_counter()
+    if task["model"] == "iforest":
+        model.fit(X_train)
+    else:
+        model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if task["model"] == "iforest":
+        raw = model.score_samples(X_test)
+        y_pred = (raw < model.offset_).astype(np.int8)  # what predict() == -1 does, without scoring twice
+        score = -raw  # higher = more anomalous
+    else:
+        proba = model.predict_proba(X_test)
+        classes = list(model.classes_)
+        score = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(X_test))
+        y_pred = model.classes_[proba.argmax(axis=1)]
+    predict_s = time.perf_counter() - t0
+
+    both = len(np.unique(y_test)) > 1
+    return dict(
+        task,
+        accuracy=accuracy_score(y_test, y_pred),
+        precision=precision_score(y_test, y_pred, zero_division=0),
+        recall=recall_score(y_test, y_pred, zero_division=0),
+        f1=f1_score(y_test, y_pred, zero_division=0),
+        roc_auc=roc_auc_score(y_test, score) if both else None,
+        train_rows=len(train_idx),
+        test_rows=len(test_idx),
+        fit_s=fit_s,
+        predict_s=predict_s,
+    )
+
+
+def trial_key(dataset, model, params, split, folds, fold):
+    return _digest(dataset, model, json.dumps(params, sort_keys=True), split, folds, fold)
+
+
+def load_memo(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                done[rec["key"]] = rec
+    return done
+
+
+def run(data_path=DATA_PATH, models=("rf", "iforest"), splits=("stratified", "time"), folds=5,
+        grids=GRIDS, jobs=None, cache_dir=CACHE_DIR):
+    """Evaluate every configuration; returns one record per trial (cached or new)."""
+    prefix = prepare_features(data_path, cache_dir)
+    dataset = os.path.basename(prefix).split("-", 1)[1]
+    memo_path = os.path.join(cache_dir, "trials.jsonl")
+    memo = load_memo(memo_path)
+
+    tasks, results = [], []
+    for split in splits:
+        folds_path, n = prepare_folds(prefix, split, folds)
+        for model in models:
+            for params in expand(grids[model]):
+                for fold in range(n):
+                    key = trial_key(dataset, model, params, split, n, fold)
+                    if key in memo:
+                        results.append(memo[key])
+                        continue
+                    tasks.append({"key": key, "dataset": dataset, "model": model, "params": params,
+                                  "split": split, "folds": n, "fold": fold,
+                                  "prefix": prefix, "folds_path": folds_path})
+
+    print(f"{len(results)} trials cached, {len(tasks)} to run")
+    if not tasks:
+        return results
+    # Biggest forests first so the pool doesn't finish on one long straggler
+    tasks.sort(key=lambda t: -(t["params"].get("n_estimators") or 100))
+    jobs = jobs or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    step = max(1, len(tasks) // 10)
+    with open(memo_path, "a") as memo_file:
+        def record(rec):
+            # Appended as each trial finishes, so an interrupted search keeps its progress
+            memo_file.write(json.dumps({k: v for k, v in rec.items() if k not in ("prefix", "folds_path")}) + "\n")
+            memo_file.flush()
+            results.append(rec)
+            record.done += 1
+            if record.done % step == 0:
+                print(f"  {record.done}/{len(tasks)} trials ({time.perf_counter() - t0:.1f}s)")
+
+        record.done = 0
+
+        if jobs == 1:
+            for task in tasks:
+                record(run_trial(task))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                for fut in as_completed([pool.submit(run_trial, t) for t in tasks]):
+                    record(fut.result())
+    print(f"Ran {len(tasks)} trials in {time.perf_counter() - t0:.1f}s on {jobs} worker(s)")
+    return results
+
+
+def summarize(results):
+    """One row per (split, model, params), best F1 first within each split."""
+    import pandas as pd
+
+    df = pd.DataFrame(results)
+    df["params"] = df["params"].map(lambda p: json.dumps(p, sort_keys=True))
+    df["roc_auc"] = pd.to_numeric(df["roc_auc"])
+    df["fit_rows_s"] = df["train_rows"] / df["fit_s"]
+    df["predict_rows_s"] = df["test_rows"] / df["predict_s"]
+    summary = df.groupby(["split", "model", "params"]).agg(
+        folds=("fold", "count"),
+        f1=("f1", "mean"),
+        f1_std=("f1", "std"),
+        precision=("precision", "mean"),
+        recall=("recall", "mean"),
+        roc_auc=("roc_auc", "mean"),
+        fit_rows_s=("fit_rows_s", "median"),
+        predict_rows_s=("predict_rows_s", "median"),
+    ).reset_index()
+    return summary.sort_values(["split", "f1", "roc_auc"], ascending=[True, False, False], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated model selection for the request IDS")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--models", default="rf,iforest", help="comma-separated: " + ",".join(GRIDS))
+    parser.add_argument("--split", choices=["stratified", "time", "both"], default="both")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--quick", action="store_true", help="small grid")
+    parser.add_argument("--top", type=int, default=10, help="rows per split to print")
+    parser.add_argument("--report", help="write the full summary to this CSV")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    unknown = [m for m in models if m not in GRIDS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+    splits = ("stratified", "time") if args.split == "both" else (args.split,)
+    results = run(args.data, models, splits, args.folds, QUICK_GRIDS if args.quick else GRIDS, args.jobs)
+
+    # Only report what this invocation asked for (the memo may hold other runs)
+    summary = summarize(results)
+    with pd.option_context("display.width", 200, "display.max_colwidth", 70, "display.float_format", "{:.3f}".format):
+        for split, part in summary.groupby("split", sort=False):
+            print(f"\n=== {split} ({part['folds'].iloc[0]} folds) ===")
+            print(part.drop(columns="split").head(args.top).to_string(index=False))
+    if args.report:
+        summary.to_csv(args.report, index=False)
+        print(f"\nFull summary: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,16 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import sys
 
-# Load your dataset with anomaly labels
-df = pd.read_csv('ml_features.csv')            # Features used for ML
-anomalies = pd.read_csv('anomalies.csv')       # Detected anomalies
+import density_plots
 
-# Merge anomaly labels back to main dataframe (assuming same order)
-df['anomaly'] = 1  # Mark all as normal initially
-df.loc[anomalies.index, 'anomaly'] = -1  # Mark anomalies
 
-# Alternatively, if anomalies.csv contains only anomalies, you can do:
-# df['anomaly'] = 1
-# df.loc[df.index.isin(anomalies.index), 'anomaly'] = -1
+def main(argv=None):
+    # Genuine vs anomalous responseTime/responseSize. One marker per request
+    # doesn't scale (or work without a display), so the points are binned
+    # into a density image and a hexbin plot instead — written to plots/.
+    # Extra args go to density_plots.py, e.g. --log, --show, --format svg.
+    argv = sys.argv[1:] if argv is None else argv
+    return density_plots.main(["--plots", "density", "hexbin", "--x", "responseTime", "--y", "responseSize"] + argv)
 
-# Separate normal and anomalous points
-normal = df[df['anomaly'] == 1]
-attack = df[df['anomaly'] == -1]
 
-# Plot scatter plot of two features, e.g., responseTime vs responseSize
-plt.figure(figsize=(10,6))
-plt.scatter(normal['responseTime'], normal['responseSize'], c='blue', label='Genuine', alpha=0.6)
-plt.scatter(attack['responseTime'], attack['responseSize'], c='red', label='Anomalous', alpha=0.6)
-
-plt.xlabel('Response Time')
-plt.ylabel('Response Size')
-plt.title('Scatter Plot of Genuine vs Anomalous HTTP Requests')
-plt.legend()
-plt.grid(True)
-plt.show()
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,20 +1,15 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import sys
 
-df = pd.read_csv('ml_features.csv')
-df['anomaly'] = pd.read_csv('anomalies.csv')['anomaly']
+import density_plots
 
-plt.figure(figsize=(8,4))
-df['anomaly'].value_counts().plot(kind='bar')
-plt.title('Normal vs Anomalous Requests')
-plt.xlabel('Label (1=Normal, -1=Anomaly)')
-plt.ylabel('Count')
-plt.show()
 
-# Plot distribution of response times for anomalies
-anomalies = df[df['anomaly'] == -1]
-plt.hist(anomalies['responseTime'], bins=20, color='red', alpha=0.7)
-plt.title('Response Time Distribution (Anomalies)')
-plt.xlabel('Response Time')
-plt.ylabel('Frequency')
-plt.show()
+def main(argv=None):
+    # Normal vs anomalous counts and the responseTime distribution, streamed
+    # from the CSVs in chunks and written to plots/ (no window needed).
+    # Extra args go to density_plots.py, e.g. --show, --format svg.
+    argv = sys.argv[1:] if argv is None else argv
+    return density_plots.main(["--plots", "labels", "hist", "--hist", "responseTime"] + argv)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,34 @@
 import json
-try:
-    with open('/home/aayush/Downloads/4thsem/newfolder1/Eigenguard/collected_data/request_log.json', 'r') as f:
-        json.load(f)
-    print("JSON is valid")
-except json.JSONDecodeError as e:
-    print(f"JSON is invalid: {e}")
\ No newline at end of file
+import os
+import sys
+
+import log_archive
+
+DATA_DIR = os.environ.get("EIGENGUARD_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "collected_data"))
+
+
+def main(path=None):
+    # No path: checksum every compacted segment and parse the archives not yet
+    # compacted and the live request_log.json (log_archive.py validate --full re-reads segments too)
+    if path is None:
+        problems = log_archive.validate(DATA_DIR)
+        if problems:
+            print("\n".join(problems))
+            return 1
+        print("All segments and archives are valid")
+        return 0
+    try:
+        with open(path, 'r') as f:
+            json.load(f)
+        print("JSON is valid")
+    except FileNotFoundError:
+        print(f"No request log at {path}")
+        return 1
+    except json.JSONDecodeError as e:
+        print(f"JSON is invalid: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2]))